@@ -1,5 +1,12 @@
+import os
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        os.makedirs(settings.PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,122 @@
+import math
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.functional import cached_property
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .cache import cache_is_shared
+
+User = get_user_model()
+
+CLAIMS = ('username', 'role', 'is_staff', 'is_superuser')
+ISSUED_AT_CLAIM = 'claims_iat'
+
+_users = {}
+
+
+def claims_changed_key(user_id):
+    return f'api:claims-changed:{user_id}'
+
+
+def mark_claims_changed(user_id, changed_at):
+    """Make tokens issued before `changed_at` fall back to the database."""
+    cache.set(
+        claims_changed_key(user_id), changed_at,
+        settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'].total_seconds()
+    )
+    _users.pop(user_id, None)
+
+
+def get_claims_changed_at(user_id):
+    """
+    When the claims of `user_id` last changed, infinity for a user that no
+    longer exists. The cache only saves reading `User.claims_changed_at`
+    from the primary, an evicted entry is read again.
+    """
+    key = claims_changed_key(user_id)
+    changed_at = cache.get(key)
+    if changed_at is None:
+        changed_at = User.objects.using(DEFAULT_DB_ALIAS).filter(
+            pk=user_id
+        ).values_list('claims_changed_at', flat=True).first()
+        if changed_at is None:
+            changed_at = math.inf
+        # `add` keeps a newer value set by mark_claims_changed meanwhile.
+        cache.add(
+            key, changed_at,
+            settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'].total_seconds()
+        )
+    return changed_at
+
+
+def get_cached_user(user_id):
+    """
+    Return the `User` row of `user_id`, kept in process memory for
+    `CLAIMS_USER_CACHE_TTL` seconds. Only for paths that need a model
+    instance, such as setting a foreign key; never save the result.
+    """
+    now = time.monotonic()
+    entry = _users.get(user_id)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+    try:
+        user = User.objects.get(pk=user_id, is_active=True)
+    except User.DoesNotExist:
+        raise AuthenticationFailed('User not found', code='user_not_found')
+    if len(_users) >= settings.CLAIMS_USER_CACHE_SIZE:
+        _users.clear()
+    _users[user_id] = (now + settings.CLAIMS_USER_CACHE_TTL, user)
+    return user
+
+
+def get_request_user(request):
+    user = request.user
+    if isinstance(user, ClaimsUser):
+        return get_cached_user(user.pk)
+    return user
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """Refresh token whose access tokens carry the claims of `CLAIMS`."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim in CLAIMS:
+            token[claim] = getattr(user, claim)
+        token[ISSUED_AT_CLAIM] = time.time()
+        return token
+
+
+class ClaimsUser(TokenUser):
+    """A user built from token claims, without touching the database."""
+
+    @cached_property
+    def role(self):
+        return self.token['role']
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    Authenticates with the claims of a `ClaimsRefreshToken`, so reading
+    requests make no user query. Tokens without the claims, or issued
+    before the user's claims last changed, are checked against the
+    database as usual. Claims are only trusted with a shared cache, where
+    a change made by one process is seen by all of them at once.
+    """
+
+    def get_user(self, validated_token):
+        issued_at = validated_token.get(ISSUED_AT_CLAIM)
+        if issued_at is None or not cache_is_shared():
+            return super().get_user(validated_token)
+        user = ClaimsUser(validated_token)
+        if get_claims_changed_at(user.pk) >= issued_at:
+            return super().get_user(validated_token)
+        return user
@@ -0,0 +1,242 @@
+from contextlib import contextmanager
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .cache import invalidate
+from .models import Category, Comment, Genre, Review, Title, User
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def split_slugs(value):
+    if isinstance(value, str):
+        return [slug.strip() for slug in value.split(',') if slug.strip()]
+    return list(value or [])
+
+
+@contextmanager
+def keep_auto_now_add(model):
+    """Let bulk_create store the `pub_date` values given in the data."""
+    fields = [field for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now_add', False)]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class ModelImporter:
+    """
+    Turns batches of plain dict rows into unsaved model instances,
+    resolving foreign keys given by natural keys with one query per batch.
+    """
+    model = None
+    fields = ()
+
+    def __init__(self, using='default'):
+        self.using = using
+        self.explicit_ids = False
+
+    def build(self, row, **extra):
+        values = {name: row[name] for name in self.fields if name in row}
+        if row.get('id') not in (None, ''):
+            values['id'] = int(row['id'])
+            self.explicit_ids = True
+        values.update(extra)
+        return self.model(**values)
+
+    def prepare(self, rows):
+        return [self.build(row) for row in rows]
+
+    def after_create(self, rows, objs):
+        pass
+
+    def lookup(self, model, field, values, cache=None):
+        """Map natural keys to primary keys, querying only unknown ones."""
+        cache = {} if cache is None else cache
+        missing = set(values) - set(cache)
+        if missing:
+            cache.update(
+                model.objects.using(self.using)
+                .filter(**{f'{field}__in': missing})
+                .values_list(field, 'pk')
+            )
+        unknown = set(values) - set(cache)
+        if unknown:
+            raise ValueError(
+                f'Unknown {model.__name__} {field}: '
+                f'{", ".join(sorted(map(str, unknown)))}'
+            )
+        return cache
+
+
+class CategoryImporter(ModelImporter):
+    model = Category
+    fields = ('name', 'slug')
+
+
+class GenreImporter(ModelImporter):
+    model = Genre
+    fields = ('name', 'slug')
+
+
+class UserImporter(ModelImporter):
+    model = User
+    fields = ('username', 'email', 'role', 'bio', 'first_name', 'last_name')
+
+    def __init__(self, using='default'):
+        super().__init__(using)
+        self.unusable_password = make_password(None)
+
+    def build(self, row, **extra):
+        return super().build(
+            row, password=row.get('password') or self.unusable_password,
+            **extra
+        )
+
+
+class TitleImporter(ModelImporter):
+    model = Title
+    fields = ('name', 'year', 'description')
+
+    def __init__(self, using='default'):
+        super().__init__(using)
+        # Categories and genres are small, their slugs stay cached.
+        self.categories = {}
+        self.genres = {}
+
+    def prepare(self, rows):
+        self.lookup(Category, 'slug',
+                    {row['category'] for row in rows}, self.categories)
+        self.lookup(Genre, 'slug',
+                    {slug for row in rows
+                     for slug in split_slugs(row.get('genre'))},
+                    self.genres)
+        return [
+            self.build(row, category_id=self.categories[row['category']])
+            for row in rows
+        ]
+
+    def after_create(self, rows, objs):
+        through = Title.genre.through
+        links = []
+        for row, title in zip(rows, objs):
+            if title.pk is None:
+                raise ValueError(
+                    'Titles need an `id` column to link their genres '
+                    'on this database'
+                )
+            links.extend(
+                through(title_id=title.pk, genre_id=self.genres[slug])
+                for slug in split_slugs(row.get('genre'))
+            )
+        through.objects.using(self.using).bulk_create(
+            links, ignore_conflicts=True
+        )
+
+
+class AuthoredImporter(ModelImporter):
+    """Base for reviews and comments, whose author is given by username."""
+    parent_field = None
+
+    def prepare(self, rows):
+        authors = self.lookup(User, 'username',
+                              {row['author'] for row in rows})
+        now = timezone.now()
+        objs = []
+        for row in rows:
+            pub_date = row.get('pub_date')
+            objs.append(self.build(
+                row,
+                author_id=authors[row['author']],
+                pub_date=parse_datetime(pub_date) if pub_date else now,
+                **{f'{self.parent_field}_id': int(row[self.parent_field])}
+            ))
+        return objs
+
+
+class ReviewImporter(AuthoredImporter):
+    model = Review
+    fields = ('text', 'score')
+    parent_field = 'title'
+
+
+class CommentImporter(AuthoredImporter):
+    model = Comment
+    fields = ('text',)
+    parent_field = 'review'
+
+
+IMPORTERS = {
+    'category': CategoryImporter,
+    'genre': GenreImporter,
+    'user': UserImporter,
+    'title': TitleImporter,
+    'review': ReviewImporter,
+    'comment': CommentImporter,
+}
+
+
+def bulk_import(importer, rows, batch_size=1000, ignore_conflicts=False):
+    """
+    Insert `rows` with bulk_create, one transaction per batch, and yield
+    the number of rows stored after every batch. Only one batch is held
+    in memory at a time. A failing batch is rolled back, the ones before
+    it stay.
+    """
+    model = importer.model
+    try:
+        with keep_auto_now_add(model):
+            for batch in batched(rows, batch_size):
+                with transaction.atomic(using=importer.using):
+                    objs = model.objects.using(importer.using).bulk_create(
+                        importer.prepare(batch),
+                        ignore_conflicts=ignore_conflicts
+                    )
+                    importer.after_create(batch, objs)
+                yield len(batch)
+    finally:
+        # The batches stored before a failure count as well.
+        if importer.explicit_ids:
+            reset_sequences(importer.using, model, Title.genre.through)
+
+
+def reset_sequences(using, *models):
+    """Move id sequences past rows that were inserted with explicit ids."""
+    connection = connections[using]
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def refresh_derived_data(models, using='default', stdout=None):
+    """
+    Rebuild what signals keep up to date for regular writes, after
+    bulk_create inserted rows of `models` behind their back.
+    """
+    if Title in models:
+        call_command('rebuild_title_search', database=using, stdout=stdout)
+    if Review in models:
+        call_command('rebuild_title_ratings', database=using, stdout=stdout)
+    if Comment in models:
+        call_command('rebuild_comment_counts', database=using,
+                     stdout=stdout)
+    for resource in ('titles', 'catalog', 'authors', 'genres', 'categories'):
+        invalidate(resource)
@@ -0,0 +1,213 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .compression import compress_response, negotiate
+from .metrics import record_cache
+
+STATS_KEYS = ('hits', 'misses')
+
+# Backends whose entries live in the memory of one process.
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_is_shared():
+    """Whether all server processes see the same cache entries."""
+    return settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_BACKENDS
+
+
+def cache_key(prefix, *parts):
+    return ':'.join(('api', prefix) + tuple(str(part) for part in parts))
+
+
+def query_hash(request):
+    """A digest of the query string that ignores the order of parameters."""
+    query = '&'.join(sorted(request.GET.urlencode().split('&')))
+    return hashlib.md5(query.encode()).hexdigest()
+
+
+def incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=settings.API_CACHE_VERSION_TIMEOUT)
+        cache.incr(key)
+
+
+def get_versions(*resources):
+    """
+    Return the change counters of `resources`, each a tuple of key parts.
+    Missing counters are seeded from the clock, so a counter that expired
+    or was evicted never comes back with a value that was already handed
+    out. Counters expire after API_CACHE_VERSION_TIMEOUT seconds, which
+    bounds how long a process that missed a bump can go on using it.
+    """
+    keys = [cache_key(*resource, 'version') for resource in resources]
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=settings.API_CACHE_VERSION_TIMEOUT)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def get_version(*resource):
+    return get_versions(resource)[0]
+
+
+def invalidate(*resource):
+    """Drop every cached response of `resource` by bumping its version."""
+    if settings.DATABASE_REPLICAS and settings.DATABASE_REPLICA_LAG:
+        # Before the bump, so no response of the new version is filled
+        # from a replica that has not caught up, see ReplicaReadsMixin.
+        cache.set(cache_key(*resource, 'changed'), True,
+                  settings.DATABASE_REPLICA_LAG)
+    key = cache_key(*resource, 'version')
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(),
+                  timeout=settings.API_CACHE_VERSION_TIMEOUT)
+
+
+def changed_recently(*resources):
+    """Whether one of `resources` was invalidated in DATABASE_REPLICA_LAG."""
+    if not (settings.DATABASE_REPLICAS and settings.DATABASE_REPLICA_LAG):
+        return False
+    keys = [cache_key(*resource, 'changed') for resource in resources]
+    return bool(cache.get_many(keys))
+
+
+def get_stats(prefix):
+    keys = {name: cache_key(prefix, name) for name in STATS_KEYS}
+    values = cache.get_many(keys.values())
+    return {name: values.get(key, 0) for name, key in keys.items()}
+
+
+class ListCacheMixin:
+    """
+    Serves `list()` from Django's cache, keyed by the full query string,
+    the renderer and the negotiated Content-Encoding. The rendered and
+    compressed body is cached, so hits are neither rendered nor compressed
+    again. `create()` and `destroy()` invalidate the cached lists.
+    """
+    cache_timeout = settings.API_LIST_CACHE_TIMEOUT
+    list_cache_key = None
+
+    def get_cache_prefix(self):
+        return self.basename
+
+    def get_count_resources(self):
+        return [(self.get_cache_prefix(),)]
+
+    def list(self, request, *args, **kwargs):
+        prefix = self.get_cache_prefix()
+        renderer = request.accepted_renderer
+        key = cache_key(
+            prefix, 'list', get_version(prefix), renderer.format,
+            negotiate(request, renderer.media_type) or 'identity',
+            query_hash(request)
+        )
+        cached = cache.get(key)
+        record_cache('list', prefix, cached is not None)
+        if cached is not None:
+            incr(cache_key(prefix, 'hits'))
+            content, content_type, encoding = cached
+            response = HttpResponse(content, content_type=content_type)
+            if encoding:
+                response['Content-Encoding'] = encoding
+            patch_vary_headers(response, ('Accept-Encoding',))
+            response['X-Cache'] = 'HIT'
+            return response
+        incr(cache_key(prefix, 'misses'))
+        self.list_cache_key = key
+        response = super().list(request, *args, **kwargs)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if (self.list_cache_key is not None
+                and isinstance(response, Response)
+                and response.status_code == status.HTTP_200_OK):
+            response.render()
+            encoding = compress_response(request, response)
+            cache.set(
+                self.list_cache_key,
+                (response.content, response['Content-Type'], encoding),
+                self.cache_timeout
+            )
+        return response
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        invalidate(self.get_cache_prefix())
+        return response
+
+    def destroy(self, request, *args, **kwargs):
+        response = super().destroy(request, *args, **kwargs)
+        invalidate(self.get_cache_prefix())
+        return response
+
+
+class ConditionalGetMixin:
+    """
+    Adds ETag/If-None-Match support to `list()` and `retrieve()`.
+    The ETag is built from the change counters returned by
+    `get_etag_resources()` and the query string, so an unchanged resource
+    is answered with 304 before the queryset is touched or anything is
+    serialized, and one page never validates another.
+    """
+
+    def get_etag_resources(self):
+        raise NotImplementedError
+
+    def get_count_resources(self):
+        # Whatever changes the ETag of a list may change its length.
+        return self.get_etag_resources()
+
+    def get_etag(self):
+        versions = get_versions(*self.get_etag_resources())
+        return quote_etag('-'.join(
+            [self.basename, self.action] + [str(v) for v in versions]
+            + [query_hash(self.request)]
+        ))
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        etag = self.get_etag()
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            etags = [tag[2:] if tag.startswith('W/') else tag
+                     for tag in parse_etags(if_none_match)]
+            record_cache('etag', self.basename, etag in etags)
+            if etag in etags:
+                return Response(
+                    status=status.HTTP_304_NOT_MODIFIED,
+                    headers={'ETag': etag}
+                )
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
@@ -0,0 +1,19 @@
+from django.core.checks import Tags, Warning, register
+
+from .cache import cache_is_shared
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    ETag counters, cached lists and counts, token claim checks and replica
+    pins only work when every server process uses the same cache.
+    """
+    if cache_is_shared():
+        return []
+    return [Warning(
+        'The default cache is local to each process.',
+        hint='Set CACHE_BACKEND and CACHE_LOCATION to a memcached server '
+             'before running more than one server process.',
+        id='api.W001',
+    )]
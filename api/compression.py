@@ -0,0 +1,177 @@
+import gzip
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class GzipCodec:
+    def compress(self, data):
+        return gzip.compress(data, settings.COMPRESSION_LEVELS['gzip'],
+                             mtime=0)
+
+    def compressor(self):
+        # wbits 31 writes the gzip header and trailer.
+        compressor = zlib.compressobj(settings.COMPRESSION_LEVELS['gzip'],
+                                      zlib.DEFLATED, 31)
+
+        def compress(data):
+            return (compressor.compress(data)
+                    + compressor.flush(zlib.Z_SYNC_FLUSH))
+        return compress, compressor.flush
+
+
+class BrotliCodec:
+    def compress(self, data):
+        return brotli.compress(data,
+                               quality=settings.COMPRESSION_LEVELS['br'])
+
+    def compressor(self):
+        compressor = brotli.Compressor(
+            quality=settings.COMPRESSION_LEVELS['br']
+        )
+
+        def compress(data):
+            return compressor.process(data) + compressor.flush()
+        return compress, compressor.finish
+
+
+class ZstdCodec:
+    def compress(self, data):
+        return zstandard.ZstdCompressor(
+            level=settings.COMPRESSION_LEVELS['zstd']
+        ).compress(data)
+
+    def compressor(self):
+        compressor = zstandard.ZstdCompressor(
+            level=settings.COMPRESSION_LEVELS['zstd']
+        ).compressobj()
+
+        def compress(data):
+            return (compressor.compress(data)
+                    + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK))
+        return compress, compressor.flush
+
+
+CODECS = {'gzip': GzipCodec()}
+if brotli is not None:
+    CODECS['br'] = BrotliCodec()
+if zstandard is not None:
+    CODECS['zstd'] = ZstdCodec()
+
+
+def parse_accept_encoding(header):
+    """Map the codings of an Accept-Encoding header to their q-values."""
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def get_content_type(response):
+    return response.get('Content-Type', '').split(';')[0].strip().lower()
+
+
+def negotiate(request, content_type):
+    """
+    Pick the coding for a response of `content_type`: the one the client
+    rates highest among those COMPRESSION_CONTENT_TYPES allows for it,
+    ties going to the first allowed one. None means identity.
+    """
+    allowed = [coding for coding in
+               settings.COMPRESSION_CONTENT_TYPES.get(content_type, ())
+               if coding in CODECS]
+    accepted = parse_accept_encoding(
+        request.META.get('HTTP_ACCEPT_ENCODING', '')
+    )
+    best, best_q = None, 0.0
+    for coding in allowed:
+        q = accepted.get(coding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress_stream(codec, parts):
+    """
+    Compress `parts` as they come, flushing after each one so the client
+    can decode every part on arrival rather than at the end of the body.
+    """
+    compress, flush = codec.compressor()
+    for part in parts:
+        data = compress(part)
+        if data:
+            yield data
+    yield flush()
+
+
+def compress_response(request, response):
+    """
+    Compress `response` in place with the negotiated coding, return the
+    coding used or None. Responses that already carry a Content-Encoding,
+    e.g. pre-compressed ones from the list cache, are left alone.
+    """
+    content_type = get_content_type(response)
+    if (response.has_header('Content-Encoding')
+            or content_type not in settings.COMPRESSION_CONTENT_TYPES):
+        return None
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if not response.streaming and (
+            len(response.content) < settings.COMPRESSION_MIN_SIZE):
+        return None
+    coding = negotiate(request, content_type)
+    if coding is None:
+        return None
+    codec = CODECS[coding]
+
+    if response.streaming:
+        response.streaming_content = compress_stream(
+            codec, response.streaming_content
+        )
+        del response['Content-Length']
+    else:
+        compressed = codec.compress(response.content)
+        if len(compressed) >= len(response.content):
+            return None
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+    # The compressed bytes are a different representation of the resource.
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response['ETag'] = 'W/' + etag
+    response['Content-Encoding'] = coding
+    return coding
+
+
+class CompressionMiddleware:
+    """Negotiates Accept-Encoding for the responses of every view."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        compress_response(request, response)
+        return response
@@ -0,0 +1,122 @@
+import hashlib
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import cache_key, changed_recently
+from .health import healthy_replicas
+from .instrumentation import instrument_stream
+
+# What the router knows about the request handled by the current thread.
+_state = threading.local()
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+def get_pin_key(request):
+    """Writes are pinned to the credentials that made them."""
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if not authorization:
+        return None
+    digest = hashlib.md5(authorization.encode()).hexdigest()
+    return cache_key('primary-pin', digest)
+
+
+class ReplicaRouter:
+    """
+    Sends the reads of replica-enabled views to a random healthy entry of
+    DATABASE_REPLICAS. Everything else goes to the primary, and so do all
+    reads after a write: for the rest of the request, and for
+    DATABASE_REPLICA_LAG seconds for the client that wrote.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (settings.DATABASE_REPLICAS
+                and getattr(_state, 'replica_reads', False)
+                and not getattr(_state, 'wrote', False)):
+            replicas = healthy_replicas()
+            if replicas:
+                return random.choice(replicas)
+        return None
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        databases = ['default'] + settings.DATABASE_REPLICAS
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+@contextmanager
+def routing(replica_reads):
+    """Route the reads of a streamed part like those of its view."""
+    _state.replica_reads = replica_reads
+    _state.wrote = False
+    try:
+        yield
+    finally:
+        _state.replica_reads = False
+        _state.wrote = False
+
+
+class ReplicaRoutingMiddleware:
+    """Tells ReplicaRouter which requests may read from replicas."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.replica_reads = False
+        _state.wrote = False
+        try:
+            response = self.get_response(request)
+            pin_key = get_pin_key(request)
+            if _state.wrote and pin_key and settings.DATABASE_REPLICA_LAG:
+                cache.set(pin_key, time.time(), settings.DATABASE_REPLICA_LAG)
+            instrument_stream(response, partial(
+                routing, _state.replica_reads and not _state.wrote
+            ))
+            return response
+        finally:
+            _state.replica_reads = False
+            _state.wrote = False
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None)
+        if (request.method in SAFE_METHODS
+                and getattr(view_class, 'replica_reads', False)):
+            pin_key = get_pin_key(request)
+            wrote_at = cache.get(pin_key) if pin_key else None
+            _state.replica_reads = (
+                wrote_at is None
+                or time.time() - wrote_at >= settings.DATABASE_REPLICA_LAG
+            )
+
+
+class ReplicaReadsMixin:
+    """
+    Lets the GET and HEAD requests of a view read from DATABASE_REPLICAS.
+    Those of resources invalidated within DATABASE_REPLICA_LAG, see
+    `get_replica_resources()`, read from the primary, so caches refilled
+    after a change, ours and nginx's, don't store what a lagging replica
+    still returns.
+    """
+    replica_reads = True
+
+    def get_replica_resources(self):
+        return self.get_count_resources()
+
+    def initial(self, request, *args, **kwargs):
+        if (getattr(_state, 'replica_reads', False)
+                and changed_recently(*self.get_replica_resources())):
+            _state.replica_reads = False
+        super().initial(request, *args, **kwargs)
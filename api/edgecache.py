@@ -0,0 +1,69 @@
+import logging
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+
+logger = logging.getLogger(__name__)
+
+# A 304 carries the Cache-Control of the response it revalidates.
+EDGE_CACHED_STATUSES = (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED)
+
+
+def purge(*paths):
+    """
+    Drop every entry of the nginx cache under `paths`, with a wildcard
+    PURGE request to EDGE_CACHE_PURGE_URL per path, see nginx/nginx.conf.
+    Failures are logged, the entries then expire after EDGE_CACHE_TIMEOUT.
+    """
+    if not settings.EDGE_CACHE_PURGE_URL:
+        return
+    for path in paths:
+        url = settings.EDGE_CACHE_PURGE_URL.rstrip('/') + path + '*'
+        request = urllib.request.Request(url, method='PURGE')
+        try:
+            urllib.request.urlopen(
+                request, timeout=settings.EDGE_CACHE_PURGE_TIMEOUT
+            ).close()
+        except urllib.error.HTTPError as error:
+            # 412 means nothing under the path was cached.
+            if error.code != status.HTTP_412_PRECONDITION_FAILED:
+                logger.warning('Purging %s failed: %s', url, error)
+        except OSError as error:
+            logger.warning('Purging %s failed: %s', url, error)
+
+
+class EdgeCacheMixin:
+    """
+    Lets shared caches keep anonymous reads for EDGE_CACHE_TIMEOUT seconds,
+    while browsers revalidate every time, and purges the nginx cache of
+    the viewset, and of `edge_purge_basenames`, after successful writes.
+    """
+    edge_purge_basenames = ()
+
+    def get_edge_purge_paths(self):
+        return [reverse(f'{basename}-list')
+                for basename in (self.basename,) + self.edge_purge_basenames]
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if request.method in SAFE_METHODS:
+            patch_vary_headers(response, ('Authorization',))
+            if (response.status_code in EDGE_CACHED_STATUSES
+                    and 'HTTP_AUTHORIZATION' not in request.META):
+                patch_cache_control(response, public=True, max_age=0,
+                                    s_maxage=settings.EDGE_CACHE_TIMEOUT)
+            else:
+                patch_cache_control(response, private=True)
+        elif status.is_success(response.status_code):
+            paths = self.get_edge_purge_paths()
+            # Purge only once the new state is visible to readers.
+            transaction.on_commit(lambda: purge(*paths))
+        return response
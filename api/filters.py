@@ -1,6 +1,7 @@
 from django_filters import rest_framework as filters
 
 from .models import Title
+from .search import get_title_search
 
 
 class TitleFilter(filters.FilterSet):
@@ -8,7 +9,11 @@ class TitleFilter(filters.FilterSet):
     category = filters.CharFilter(field_name='category__slug',
                                   lookup_expr='exact')
     genre = filters.CharFilter(field_name='genre__slug', lookup_expr='exact')
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Title
-        fields = ['name', 'category', 'genre', 'year', ]
+        fields = ['name', 'category', 'genre', 'year', 'search', ]
+
+    def filter_search(self, queryset, name, value):
+        return get_title_search(queryset.db).search(queryset, value)
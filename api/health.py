@@ -0,0 +1,98 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.http import HttpResponse
+
+# alias -> (time.monotonic() of the last check, whether it passed)
+_replica_checks = {}
+
+
+def close_unusable_connections():
+    """
+    Close persistent connections that no longer answer, e.g. after a
+    database restart, so the request opens a fresh one instead of failing.
+    Each one is pinged at most every CONN_HEALTH_CHECK_INTERVAL seconds,
+    not on every request.
+    """
+    if not settings.CONN_HEALTH_CHECKS:
+        return
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is None:
+            continue
+        checked_at = getattr(connection, 'health_checked_at', None)
+        if (checked_at is not None
+                and now - checked_at < settings.CONN_HEALTH_CHECK_INTERVAL):
+            continue
+        connection.health_checked_at = now
+        if not connection.is_usable():
+            connection.close()
+
+
+def check_database(alias=DEFAULT_DB_ALIAS):
+    with connections[alias].cursor() as cursor:
+        cursor.execute('SELECT 1')
+
+
+def healthy_replicas():
+    """
+    The entries of DATABASE_REPLICAS that answered their last check. Each
+    one is checked at most every DATABASE_REPLICA_CHECK_INTERVAL seconds
+    per process, so a replica that went down leaves the routing, and one
+    that came back returns to it, without failing readiness.
+    """
+    now = time.monotonic()
+    healthy = []
+    for alias in settings.DATABASE_REPLICAS:
+        checked_at, ok = _replica_checks.get(alias, (None, True))
+        if (checked_at is None or
+                now - checked_at >= settings.DATABASE_REPLICA_CHECK_INTERVAL):
+            try:
+                check_database(alias)
+            except DatabaseError:
+                connections[alias].close()
+                ok = False
+            else:
+                ok = True
+            _replica_checks[alias] = (now, ok)
+        if ok:
+            healthy.append(alias)
+    return healthy
+
+
+def check_cache():
+    cache.set('api:health', 1, 5)
+    if cache.get('api:health') != 1:
+        raise RuntimeError('cache lost a value')
+
+
+# Replicas are left out, healthy_replicas() routes around them.
+CHECKS = {
+    'database': check_database,
+    'cache': check_cache,
+}
+
+
+def liveness(request):
+    """The process answers, restart it otherwise."""
+    return HttpResponse('ok', content_type='text/plain')
+
+
+def readiness(request):
+    """The process can serve requests, stop routing to it otherwise."""
+    results = {}
+    for name, check in CHECKS.items():
+        try:
+            check()
+        except (DatabaseError, RuntimeError) as error:
+            results[name] = f'failed: {error}'
+        else:
+            results[name] = 'ok'
+    failed = any(result != 'ok' for result in results.values())
+    return HttpResponse(
+        json.dumps(results), content_type='application/json',
+        status=503 if failed else 200
+    )
@@ -0,0 +1,53 @@
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+
+@contextmanager
+def execute_wrapper(wrapper):
+    """Install `wrapper` on every database connection of this thread."""
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(wrapper))
+        yield
+
+
+class InstrumentedStream:
+    """
+    The body of a streamed response, with every part produced inside
+    `context()`. Streamed pages serialize, and query, after the middleware
+    returned, possibly on another thread, so middleware that instruments
+    the view re-enters its instrumentation around each part through this,
+    and finishes its bookkeeping in `on_close` once the body is done.
+    """
+
+    def __init__(self, parts, context, on_close=None):
+        self.parts = iter(parts)
+        self.context = context
+        self.on_close = on_close
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with self.context():
+            return next(self.parts)
+
+    def close(self):
+        on_close, self.on_close = self.on_close, None
+        if on_close is not None:
+            on_close()
+
+
+def instrument_stream(response, context, on_close=None):
+    """
+    Produce the parts of a streamed `response` inside `context()` and call
+    `on_close` once it is closed. Return whether `response` is streamed;
+    `on_close` is left to the caller otherwise.
+    """
+    if not response.streaming:
+        return False
+    response.streaming_content = InstrumentedStream(
+        response.streaming_content, context, on_close
+    )
+    return True
@@ -0,0 +1,105 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import mail
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .metrics import MAIL_SEND_LATENCY
+from .models import MailJob
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(to_email, subject, body):
+    return MailJob.objects.create(
+        to_email=to_email, subject=subject, body=body
+    )
+
+
+def retry_delay(attempts):
+    return timedelta(
+        seconds=settings.MAIL_QUEUE_RETRY_DELAY * 2 ** (attempts - 1)
+    )
+
+
+def claim(batch_size):
+    """
+    Lease up to `batch_size` due jobs by pushing their `run_at` forward,
+    so a crashed worker's jobs become due again once the lease expires.
+    Concurrent workers skip each other's locked rows where supported.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        due = MailJob.objects.filter(
+            status=MailJob.Status.PENDING, run_at__lte=now
+        ).order_by('run_at')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        jobs = list(due[:batch_size])
+        MailJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            run_at=now + timedelta(seconds=settings.MAIL_QUEUE_LEASE)
+        )
+    return jobs
+
+
+def record_failure(job, error):
+    """Count a failed attempt, retry with backoff up to the attempt limit."""
+    job.attempts += 1
+    job.last_error = repr(error)
+    if job.attempts >= settings.MAIL_QUEUE_MAX_ATTEMPTS:
+        job.status = MailJob.Status.FAILED
+        # Bodies carry confirmation codes, keep them only while queued.
+        job.body = ''
+    else:
+        job.run_at = timezone.now() + retry_delay(job.attempts)
+    job.save(update_fields=['attempts', 'last_error', 'status', 'run_at',
+                            'body'])
+
+
+def process_batch(batch_size=None):
+    """Send one batch of due jobs over a single mail connection."""
+    jobs = claim(batch_size or settings.MAIL_QUEUE_BATCH_SIZE)
+    if not jobs:
+        return 0, 0
+    mail_connection = mail.get_connection()
+    try:
+        mail_connection.open()
+    except Exception as error:
+        # Reschedule the batch instead of leaving it leased.
+        logger.warning('Opening the mail connection failed: %r', error)
+        for job in jobs:
+            record_failure(job, error)
+        return 0, len(jobs)
+    sent = []
+    try:
+        for job in jobs:
+            message = mail.EmailMessage(
+                job.subject, job.body, settings.NOREPLY_YAMDB_EMAIL,
+                [job.to_email], connection=mail_connection
+            )
+            started = time.perf_counter()
+            try:
+                message.send(fail_silently=False)
+            except Exception as error:
+                MAIL_SEND_LATENCY.labels('failed').observe(
+                    time.perf_counter() - started
+                )
+                record_failure(job, error)
+            else:
+                MAIL_SEND_LATENCY.labels('sent').observe(
+                    time.perf_counter() - started
+                )
+                sent.append(job.pk)
+    finally:
+        try:
+            mail_connection.close()
+        except Exception as error:
+            logger.warning('Closing the mail connection failed: %r', error)
+        MailJob.objects.filter(pk__in=sent).update(
+            status=MailJob.Status.SENT, attempts=F('attempts') + 1, body=''
+        )
+    return len(sent), len(jobs) - len(sent)
@@ -0,0 +1,97 @@
+import os
+import platform
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from benchmarks.harness import (compare, isolated, load_baseline, measure,
+                                save_results)
+from benchmarks.routes import ROUTES, build_context
+
+DEFAULT_BASELINE = os.path.join(settings.BASE_DIR, 'benchmarks',
+                                'baseline.json')
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every API route against the current database, e.g. one '
+        'built with generate_data, and fail on regressions from a baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'routes', nargs='*',
+            help='Only run routes whose name starts with one of these'
+        )
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+        parser.add_argument(
+            '--threshold', type=float, default=0.25,
+            help='Allowed relative growth of latency and memory'
+        )
+        parser.add_argument(
+            '--update', action='store_true',
+            help='Store the results as the new baseline'
+        )
+        parser.add_argument('--output', help='Also write results here')
+
+    def handle(self, *args, **options):
+        with isolated():
+            self.run(options)
+
+    def run(self, options):
+        routes = [
+            route for route in ROUTES
+            if not options['routes']
+            or route.name.startswith(tuple(options['routes']))
+        ]
+        if not routes:
+            raise CommandError('No route matches the given names')
+        try:
+            context = build_context()
+        except LookupError as error:
+            raise CommandError(error)
+
+        results = {}
+        self.stdout.write(
+            f'{"route":<24}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}'
+            f'{"ttfb ms":>10}{"queries":>9}{"peak KB":>10}'
+        )
+        for route in routes:
+            metrics = measure(route, context, options['iterations'],
+                              options['warmup'])
+            results[route.name] = metrics
+            self.stdout.write(
+                f'{route.name:<24}{metrics["p50_ms"]:>10.2f}'
+                f'{metrics["p95_ms"]:>10.2f}{metrics["p99_ms"]:>10.2f}'
+                f'{metrics["ttfb_ms"]:>10.2f}{metrics["queries"]:>9}'
+                f'{metrics["peak_kb"]:>10.1f}'
+            )
+
+        meta = {
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'iterations': options['iterations'],
+        }
+        if options['output']:
+            save_results(options['output'], results, meta)
+        if options['update']:
+            save_results(options['baseline'], results, meta)
+            self.stdout.write(self.style.SUCCESS(
+                f'Baseline written to {options["baseline"]}'
+            ))
+            return
+        if not os.path.exists(options['baseline']):
+            self.stdout.write(self.style.WARNING(
+                'No baseline to compare with, rerun with --update to store one'
+            ))
+            return
+        regressions = compare(results, load_baseline(options['baseline']),
+                              options['threshold'])
+        if regressions:
+            raise CommandError(
+                'Performance regressions:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('No regressions'))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.compression import COMPRESSION_ROUTES, run_compression
+from benchmarks.harness import isolated
+from benchmarks.routes import build_context
+
+
+class Command(BaseCommand):
+    help = (
+        'Report the bytes on the wire and the CPU milliseconds of every '
+        'Content-Encoding for the title and review list pages'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--routes', nargs='+', default=list(COMPRESSION_ROUTES)
+        )
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with isolated():
+            try:
+                context = build_context()
+            except LookupError as error:
+                raise CommandError(error)
+            results = run_compression(
+                context, options['routes'], options['iterations']
+            )
+        self.stdout.write(
+            f'{"route":<26}{"coding":<10}{"bytes":>10}{"ratio":>8}'
+            f'{"cpu ms":>9}'
+        )
+        for name, codings in results.items():
+            identity = codings['identity']['bytes']
+            for coding, result in codings.items():
+                self.stdout.write(
+                    f'{name:<26}{coding:<10}{result["bytes"]:>10}'
+                    f'{identity / result["bytes"]:>7.1f}x'
+                    f'{result["cpu_ms"]:>9.2f}'
+                )
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api_yamdb.handlers import ReadPoolASGIHandler
+from benchmarks.concurrency import measure_concurrency, query_latency
+from benchmarks.harness import isolated
+from benchmarks.routes import CATALOG_READS, build_context
+
+
+class Command(BaseCommand):
+    help = (
+        'Serve the catalog read routes through the ASGI application with '
+        'growing numbers of concurrent clients and report the throughput '
+        'gain over one client at a time'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=[1, 4, 16]
+        )
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument(
+            '--query-latency', type=float, default=2.0,
+            help='Milliseconds added to every query, like a network round '
+                 'trip to a database server'
+        )
+
+    def handle(self, *args, **options):
+        with isolated():
+            self.run(options)
+
+    def run(self, options):
+        try:
+            context = build_context()
+        except LookupError as error:
+            raise CommandError(error)
+
+        self.stdout.write(
+            f'{"clients":>8}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}'
+            f'{"gain":>8}'
+        )
+        serial = None
+        with query_latency(options['query_latency']):
+            application = ReadPoolASGIHandler()
+            for concurrency in sorted(options['concurrency']):
+                metrics = measure_concurrency(
+                    application, CATALOG_READS, context, concurrency,
+                    options['requests']
+                )
+                serial = serial or metrics['rps']
+                self.stdout.write(
+                    f'{concurrency:>8}{metrics["rps"]:>10.1f}'
+                    f'{metrics["p50_ms"]:>10.2f}{metrics["p95_ms"]:>10.2f}'
+                    f'{metrics["rps"] / serial:>7.1f}x'
+                )
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from benchmarks.serializers import PAGE_SIZES, measure_paths
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare TitleReadSerializer over model instances with '
+        'TitleRowSerializer over value rows at 10, 100 and 1000 titles'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=list(PAGE_SIZES)
+        )
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"titles":>8}{"model ms":>10}{"rows ms":>10}{"speedup":>9}'
+        )
+        for size in options['sizes']:
+            results = measure_paths(size, options['iterations'])
+            self.stdout.write(
+                f'{size:>8}{results["model"]:>10.2f}{results["rows"]:>10.2f}'
+                f'{results["model"] / results["rows"]:>8.1f}x'
+            )
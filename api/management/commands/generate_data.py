@@ -0,0 +1,226 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from api.bulk import (batched, keep_auto_now_add, refresh_derived_data,
+                      reset_sequences)
+from api.models import Category, Comment, Genre, Review, Title, User
+
+WORDS = (
+    'night', 'city', 'river', 'shadow', 'summer', 'dream', 'stone', 'house',
+    'storm', 'garden', 'winter', 'mirror', 'silent', 'golden', 'broken',
+    'last', 'wild', 'blue', 'iron', 'glass', 'road', 'star', 'fire', 'sea',
+    'song', 'empire', 'ghost', 'secret', 'lost', 'heart', 'machine', 'war',
+)
+CATEGORIES = ('Movies', 'Books', 'Music', 'TV Shows', 'Games', 'Comics')
+GENRES = (
+    'Drama', 'Comedy', 'Thriller', 'Horror', 'Romance', 'Fantasy', 'Sci-Fi',
+    'Documentary', 'Crime', 'Adventure', 'Animation', 'History', 'Rock',
+    'Pop', 'Jazz', 'Classical', 'Electronic', 'Biography', 'Mystery', 'War',
+)
+
+
+def power_law_count(rng, mean, alpha, cap=None):
+    """
+    Draw a non-negative count from a Pareto (Zipf-like) distribution with
+    the given mean, so a few parents get most of the children.
+    """
+    scale = mean * (alpha - 1) / alpha
+    value = scale * rng.paretovariate(alpha)
+    count = int(value) + (rng.random() < value % 1)
+    return min(count, cap) if cap is not None else count
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a seeded synthetic dataset for load and benchmark tests. '
+        'Reviews per title and comments per review follow a power law.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reviews', type=int, default=10000,
+            help='Approximate number of reviews, the main size knob'
+        )
+        parser.add_argument(
+            '--titles', type=int,
+            help='Number of titles, reviews / 50 by default'
+        )
+        parser.add_argument(
+            '--users', type=int,
+            help='Number of users, reviews / 10 by default'
+        )
+        parser.add_argument(
+            '--comments-per-review', type=float, default=0.5,
+            help='Average number of comments per review'
+        )
+        parser.add_argument(
+            '--alpha', type=float, default=1.5,
+            help='Pareto shape of the skew, lower is more skewed'
+        )
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        if options['alpha'] <= 1:
+            raise CommandError('--alpha must be greater than 1')
+        self.rng = random.Random(options['seed'])
+        self.using = options['database']
+        self.batch_size = options['batch_size']
+        self.password = make_password(None)
+        self.now = timezone.now()
+        reviews = options['reviews']
+        titles = options['titles'] or max(reviews // 50, 1)
+        users = options['users'] or max(reviews // 10, 1)
+
+        started = time.monotonic()
+        categories = self.make_catalog(Category, CATEGORIES)
+        genres = self.make_catalog(Genre, GENRES)
+        user_ids = self.insert(User, self.users(users))
+        title_ids = self.insert(Title, self.titles(titles, categories))
+        self.link_genres(title_ids, genres)
+        self.insert_reviews(title_ids, user_ids, reviews, options)
+        reset_sequences(self.using, Category, Genre, User, Title,
+                        Title.genre.through, Review, Comment)
+        refresh_derived_data([Title, Review], self.using, self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated data in {time.monotonic() - started:.1f}s'
+        ))
+
+    def next_id(self, model):
+        return (model.objects.using(self.using)
+                .aggregate(top=Max('pk'))['top'] or 0) + 1
+
+    def insert(self, model, objs, report=True):
+        """Bulk insert `objs` in batches and return the range of their ids."""
+        first = self.next_id(model)
+        count = 0
+        started = time.monotonic()
+        with keep_auto_now_add(model):
+            for batch in batched(objs, self.batch_size):
+                for offset, obj in enumerate(batch, first + count):
+                    obj.pk = offset
+                with transaction.atomic(using=self.using):
+                    model.objects.using(self.using).bulk_create(batch)
+                count += len(batch)
+        if report:
+            elapsed = time.monotonic() - started or 1e-9
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: {count} rows, '
+                f'{count / elapsed:.0f} rows/s'
+            )
+        return range(first, first + count)
+
+    def text(self, words):
+        return ' '.join(self.rng.choice(WORDS) for _ in range(words))
+
+    def date(self, after=None, within=timedelta(days=5 * 365)):
+        start = after or self.now - within
+        span = (self.now - start).total_seconds()
+        return start + timedelta(seconds=self.rng.random() * span)
+
+    def make_catalog(self, model, names):
+        existing = dict(model.objects.using(self.using)
+                        .values_list('slug', 'pk'))
+        missing = [
+            model(name=name, slug=name.lower().replace(' ', '-'))
+            for name in names
+            if name.lower().replace(' ', '-') not in existing
+        ]
+        model.objects.using(self.using).bulk_create(missing)
+        return list(model.objects.using(self.using)
+                    .values_list('pk', flat=True))
+
+    def users(self, count):
+        first = self.next_id(User)
+        for number in range(first, first + count):
+            role = User.Role.MODERATOR if number % 100 == 0 else User.Role.USER
+            yield User(
+                username=f'user{number}', email=f'user{number}@yamdb.fake',
+                password=self.password, role=role, date_joined=self.now
+            )
+
+    def titles(self, count, categories):
+        for _ in range(count):
+            yield Title(
+                name=self.text(self.rng.randint(1, 4)).capitalize(),
+                year=self.rng.randint(1900, self.now.year),
+                description=self.text(self.rng.randint(5, 25)),
+                category_id=self.rng.choice(categories),
+            )
+
+    def link_genres(self, title_ids, genres):
+        through = Title.genre.through
+        links = (
+            through(title_id=title_id, genre_id=genre_id)
+            for title_id in title_ids
+            for genre_id in self.rng.sample(
+                genres, min(self.rng.randint(1, 3), len(genres))
+            )
+        )
+        self.insert(through, links, report=False)
+
+    def insert_reviews(self, title_ids, user_ids, total, options):
+        """
+        Stream reviews title by title with distinct authors per title,
+        and insert the comments of every batch of reviews right behind it.
+        """
+        mean = total / len(title_ids)
+        pending_comments = []
+
+        def reviews():
+            for title_id in title_ids:
+                count = power_law_count(
+                    self.rng, mean, options['alpha'], cap=len(user_ids)
+                )
+                for author_id in self.rng.sample(user_ids, count):
+                    review = Review(
+                        title_id=title_id, author_id=author_id,
+                        text=self.text(self.rng.randint(10, 60)),
+                        score=self.rng.randint(1, 10), pub_date=self.date()
+                    )
+                    comments = power_law_count(
+                        self.rng, options['comments_per_review'],
+                        options['alpha']
+                    )
+                    review.comments_count = comments
+                    pending_comments.extend([review] * comments)
+                    yield review
+
+        self.stdout.write(f'Generating about {total} reviews')
+        next_review = self.next_id(Review)
+        next_comment = self.next_id(Comment)
+        reviews_count = comments_count = 0
+        started = time.monotonic()
+        with keep_auto_now_add(Review), keep_auto_now_add(Comment):
+            for batch in batched(reviews(), self.batch_size):
+                for review in batch:
+                    review.pk = next_review
+                    next_review += 1
+                comments = []
+                for review in pending_comments:
+                    comments.append(Comment(
+                        pk=next_comment, review_id=review.pk,
+                        author_id=self.rng.choice(user_ids),
+                        text=self.text(self.rng.randint(3, 30)),
+                        pub_date=self.date(after=review.pub_date),
+                    ))
+                    next_comment += 1
+                pending_comments.clear()
+                with transaction.atomic(using=self.using):
+                    Review.objects.using(self.using).bulk_create(batch)
+                    Comment.objects.using(self.using).bulk_create(comments)
+                reviews_count += len(batch)
+                comments_count += len(comments)
+        elapsed = time.monotonic() - started or 1e-9
+        self.stdout.write(
+            f'reviews: {reviews_count} rows, comments: {comments_count} '
+            f'rows, {(reviews_count + comments_count) / elapsed:.0f} rows/s'
+        )
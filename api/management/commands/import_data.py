@@ -0,0 +1,91 @@
+import csv
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from api.bulk import IMPORTERS, bulk_import, refresh_derived_data
+
+FORMATS = ('csv', 'jsonl')
+
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8') as source:
+        yield from csv.DictReader(source)
+
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as source:
+        for line in source:
+            if line.strip():
+                yield json.loads(line)
+
+
+READERS = {'csv': read_csv, 'jsonl': read_jsonl}
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream rows from a CSV or JSONL file into the database with '
+        'batched bulk inserts. Foreign keys are given by natural keys: '
+        'category and comma separated genre slugs for titles, author '
+        'username and title/review id for reviews and comments.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=sorted(IMPORTERS))
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Input format, guessed from the file extension by default'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--ignore-conflicts', action='store_true',
+            help='Skip rows that violate unique constraints'
+        )
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or options['path'].rsplit('.', 1)[-1]
+        if fmt not in READERS:
+            raise CommandError(
+                f'Unknown format {fmt!r}, use --format {"/".join(FORMATS)}'
+            )
+        importer = IMPORTERS[options['model']](options['database'])
+        rows = READERS[fmt](options['path'])
+
+        total = 0
+        started = reported = time.monotonic()
+        try:
+            for count in bulk_import(importer, rows, options['batch_size'],
+                                     options['ignore_conflicts']):
+                total += count
+                now = time.monotonic()
+                if now - reported >= 1:
+                    reported = now
+                    self.report(total, now - started)
+        except KeyError as error:
+            raise CommandError(
+                f'Batch starting at row {total + 1}: missing column {error}'
+            )
+        except IntegrityError as error:
+            raise CommandError(
+                f'Batch starting at row {total + 1}: {error}, '
+                f'rerun with --ignore-conflicts to skip existing rows'
+            )
+        except ValueError as error:
+            raise CommandError(f'Batch starting at row {total + 1}: {error}')
+        else:
+            self.report(total, time.monotonic() - started)
+        finally:
+            # Batches stored before a failure need their derived data too.
+            if total:
+                refresh_derived_data(
+                    [importer.model], options['database'], self.stdout
+                )
+
+    def report(self, total, elapsed):
+        rate = total / elapsed if elapsed else total
+        self.stdout.write(f'{total} rows, {rate:.0f} rows/s')
@@ -0,0 +1,47 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.mailqueue import process_batch
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Send queued emails in batches, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=settings.MAIL_QUEUE_BATCH_SIZE,
+            help='Maximum number of emails sent over one connection'
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=1.0,
+            help='Seconds to wait when the queue is empty'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Process the due emails and exit'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                sent, failed = process_batch(options['batch_size'])
+            except Exception:
+                # e.g. the database went away; leased jobs become due
+                # again once MAIL_QUEUE_LEASE expires.
+                logger.exception('Processing a mail batch failed')
+                if options['once']:
+                    return
+                time.sleep(options['sleep'])
+                continue
+            if sent or failed:
+                self.stdout.write(f'Sent {sent} emails, {failed} failed')
+            elif options['once']:
+                return
+            else:
+                time.sleep(options['sleep'])
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import ConfirmationCode, MailJob
+
+
+class Command(BaseCommand):
+    help = ('Delete expired confirmation codes in batches and clear the '
+            'bodies of delivered emails')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        expired = ConfirmationCode.objects.filter(expires_at__lte=now)
+        total = 0
+        while True:
+            ids = list(expired.values_list('pk', flat=True)
+                       [:options['batch_size']])
+            if not ids:
+                break
+            deleted, _ = ConfirmationCode.objects.filter(pk__in=ids).delete()
+            total += deleted
+        # Jobs finished before bodies were cleared on delivery.
+        cleared = MailJob.objects.exclude(
+            status=MailJob.Status.PENDING
+        ).exclude(body='').update(body='')
+        self.stdout.write(
+            self.style.SUCCESS(f'Deleted {total} expired confirmation codes, '
+                               f'cleared {cleared} email bodies')
+        )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import Review
+
+
+class Command(BaseCommand):
+    help = 'Recalculate the stored comment count of every review'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        with transaction.atomic(using=using):
+            updated = Review.recount_comments(Review.objects.using(using))
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt comment counts for {updated} reviews')
+        )
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from api.models import Review, Title
+
+
+class Command(BaseCommand):
+    help = 'Recalculate the stored rating sum and count of every title'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        reviews = Review.objects.filter(
+            title=OuterRef('pk')
+        ).order_by().values('title')
+        score_sum = reviews.annotate(total=Sum('score')).values('total')
+        score_count = reviews.annotate(total=Count('pk')).values('total')
+        with transaction.atomic(using=using):
+            updated = Title.objects.using(using).update(
+                rating_sum=Coalesce(
+                    Subquery(score_sum, output_field=IntegerField()), 0
+                ),
+                rating_count=Coalesce(
+                    Subquery(score_count, output_field=IntegerField()), 0
+                ),
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt ratings for {updated} titles')
+        )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.search import get_title_search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of titles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        search = get_title_search(options['database'])
+        with transaction.atomic(using=options['database']):
+            search.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt title search index with {type(search).__name__}'
+        ))
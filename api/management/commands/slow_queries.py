@@ -0,0 +1,62 @@
+import glob
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Summarize the slow query log, rotated files included, by query '
+        'fingerprint, worst total time first'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=settings.SLOW_QUERY_LOG)
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--view', help='Only queries made by this view')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not path:
+            raise CommandError('Set SLOW_QUERY_LOG or pass --path')
+        # Files rotated by logrotate are `<path>.1` and up, compressed ones
+        # are skipped.
+        paths = [path] + sorted(
+            name for name in glob.glob(f'{glob.escape(path)}.*')
+            if name[len(path) + 1:].isdigit()
+        )
+        groups = {}
+        for name in paths:
+            if not os.path.exists(name):
+                continue
+            with open(name, encoding='utf-8') as source:
+                for line in source:
+                    record = json.loads(line)
+                    if options['view'] and record['view'] != options['view']:
+                        continue
+                    group = groups.setdefault(record['fingerprint'], {
+                        'sql': record['sql'], 'plan': record['plan'],
+                        'count': 0, 'total': 0.0, 'max': 0.0, 'views': set(),
+                    })
+                    group['count'] += 1
+                    group['total'] += record['duration_ms']
+                    group['max'] = max(group['max'], record['duration_ms'])
+                    group['views'].add(record['view'] or '-')
+        if not groups:
+            self.stdout.write('No slow queries recorded')
+            return
+
+        worst = sorted(groups.items(), key=lambda item: -item[1]['total'])
+        for fingerprint, group in worst[:options['limit']]:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{fingerprint}  total {group["total"]:.1f} ms  '
+                f'count {group["count"]}  '
+                f'avg {group["total"] / group["count"]:.1f} ms  '
+                f'max {group["max"]:.1f} ms'
+            ))
+            self.stdout.write(f'  views: {", ".join(sorted(group["views"]))}')
+            self.stdout.write(f'  {group["sql"]}')
+            for step in group['plan']:
+                self.stdout.write(f'    {step}')
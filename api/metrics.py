@@ -0,0 +1,133 @@
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram,
+    generate_latest
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+
+from .instrumentation import execute_wrapper, instrument_stream
+
+# Every worker process writes its samples to mmaped files in
+# PROMETHEUS_MULTIPROC_DIR, /metrics adds up the files of all of them.
+REQUESTS = Counter(
+    'api_requests', 'HTTP requests handled',
+    ['view', 'method', 'status']
+)
+REQUEST_LATENCY = Histogram(
+    'api_request_duration_seconds', 'Time spent handling a request',
+    ['view'],
+    buckets=(.005, .01, .025, .05, .075, .1, .25, .5, .75, 1, 2.5, 5, 10)
+)
+REQUEST_QUERIES = Histogram(
+    'api_request_queries', 'Database queries made by a request',
+    ['view'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+)
+CACHE_REQUESTS = Counter(
+    'api_cache_requests', 'Lookups of cached responses',
+    ['cache', 'resource', 'result']
+)
+MAIL_SEND_LATENCY = Histogram(
+    'api_mail_send_duration_seconds', 'Time spent sending one mail',
+    ['result'],
+    buckets=(.01, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+)
+
+
+def get_view_name(request):
+    """
+    Label a request with its viewset and action, e.g. `TitleViewSet.list`,
+    using the resolved route so every view is covered.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None:
+        return match.view_name or 'unmatched'
+    actions = getattr(match.func, 'actions', None)
+    if actions:
+        action = actions.get(request.method.lower(), request.method.lower())
+        return f'{view_class.__name__}.{action}'
+    return view_class.__name__
+
+
+def record_cache(cache, resource, hit):
+    CACHE_REQUESTS.labels(cache, resource, 'hit' if hit else 'miss').inc()
+
+
+class MetricsMiddleware:
+    """
+    Counts every request, its latency and its database queries, those of
+    streamed bodies included.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with execute_wrapper(count_query):
+            response = self.get_response(request)
+        view = get_view_name(request)
+
+        def observe():
+            REQUESTS.labels(view, request.method, response.status_code).inc()
+            REQUEST_LATENCY.labels(view).observe(
+                time.perf_counter() - started
+            )
+            REQUEST_QUERIES.labels(view).observe(queries)
+
+        # Streamed pages are counted once their last part is sent.
+        if not instrument_stream(
+                response, lambda: execute_wrapper(count_query), observe):
+            observe()
+        return response
+
+
+class CacheHitRatioCollector:
+    """Derives `api_cache_hit_ratio` from the summed cache lookups."""
+
+    def __init__(self, source):
+        self.source = source
+
+    def collect(self):
+        lookups = defaultdict(lambda: {'hit': 0.0, 'miss': 0.0})
+        for metric in self.source.collect():
+            yield metric
+            if metric.name != 'api_cache_requests':
+                continue
+            for sample in metric.samples:
+                if sample.name.endswith('_total'):
+                    key = sample.labels['cache'], sample.labels['resource']
+                    lookups[key][sample.labels['result']] += sample.value
+        ratio = GaugeMetricFamily(
+            'api_cache_hit_ratio', 'Share of cache lookups that were hits',
+            labels=['cache', 'resource']
+        )
+        for labels, counts in sorted(lookups.items()):
+            total = counts['hit'] + counts['miss']
+            ratio.add_metric(labels, counts['hit'] / total if total else 0)
+        yield ratio
+
+
+def metrics(request):
+    registry = CollectorRegistry()
+    registry.register(CacheHitRatioCollector(
+        MultiProcessCollector(None, settings.PROMETHEUS_MULTIPROC_DIR)
+    ))
+    return HttpResponse(
+        generate_latest(registry), content_type=CONTENT_TYPE_LATEST
+    )
@@ -0,0 +1,38 @@
+# Generated by Django 3.0.7 on 2026-10-18 20:08
+
+from django.db import migrations, models
+
+
+def fill_rating_counters(apps, schema_editor):
+    Title = apps.get_model('api', 'Title')
+    Review = apps.get_model('api', 'Review')
+    db = schema_editor.connection.alias
+    totals = Review.objects.using(db).values('title').annotate(
+        score_sum=models.Sum('score'), score_count=models.Count('pk')
+    )
+    for row in totals:
+        Title.objects.using(db).filter(pk=row['title']).update(
+            rating_sum=row['score_sum'], rating_count=row['score_count']
+        )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(
+            fill_rating_counters, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 3.0.7 on 2026-10-18 20:11
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def delete_duplicate_reviews(apps, schema_editor):
+    """
+    Keep the first review of every author on a title, the one the
+    constraint would have let in, and recount the ratings it changes.
+    """
+    Title = apps.get_model('api', 'Title')
+    Review = apps.get_model('api', 'Review')
+    db = schema_editor.connection.alias
+    reviews = Review.objects.using(db)
+    duplicates = reviews.values('author', 'title').annotate(
+        total=models.Count('pk'), first_id=models.Min('pk')
+    ).filter(total__gt=1)
+    title_ids = set()
+    for row in duplicates:
+        reviews.filter(author=row['author'], title=row['title']).exclude(
+            pk=row['first_id']
+        ).delete()
+        title_ids.add(row['title'])
+    if not title_ids:
+        return
+    scores = reviews.filter(
+        title=models.OuterRef('pk')
+    ).order_by().values('title')
+    score_sum = scores.annotate(total=models.Sum('score')).values('total')
+    score_count = scores.annotate(total=models.Count('pk')).values('total')
+    Title.objects.using(db).filter(pk__in=title_ids).update(
+        rating_sum=Coalesce(
+            models.Subquery(score_sum, output_field=models.IntegerField()), 0
+        ),
+        rating_count=Coalesce(
+            models.Subquery(score_count, output_field=models.IntegerField()), 0
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_pub_date_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            delete_duplicate_reviews, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='review',
+            constraint=models.UniqueConstraint(fields=('author', 'title'), name='unique_review_author_title'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+# The DDL of api.search as of this migration, frozen so later changes to
+# the search backends don't change what the migration does.
+INSTALL_SQL = {
+    'sqlite': [
+        'CREATE VIRTUAL TABLE IF NOT EXISTS api_title_fts '
+        'USING fts5(name, description)',
+        'DELETE FROM api_title_fts',
+        'INSERT INTO api_title_fts (rowid, name, description) '
+        'SELECT id, name, description FROM api_title',
+    ],
+    'postgresql': [
+        'CREATE INDEX IF NOT EXISTS api_title_search_idx ON api_title '
+        "USING GIN ((to_tsvector('simple', name || ' ' || description)))",
+    ],
+}
+UNINSTALL_SQL = {
+    'sqlite': ['DROP TABLE IF EXISTS api_title_fts'],
+    'postgresql': ['DROP INDEX IF EXISTS api_title_search_idx'],
+}
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        for sql in statements.get(vendor, ()):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_unique_review_author_title'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor(INSTALL_SQL), run_for_vendor(UNINSTALL_SQL)
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 3.0.7 on 2026-10-18 20:17
+
+import hashlib
+import hmac
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def hash_code(code):
+    # ConfirmationCode.hash_code as of this migration.
+    return hmac.new(
+        settings.SECRET_KEY.encode(), code.encode(), hashlib.sha256
+    ).hexdigest()
+
+
+def move_confirmation_codes(apps, schema_editor):
+    User = apps.get_model('api', 'User')
+    ConfirmationCode = apps.get_model('api', 'ConfirmationCode')
+    db = schema_editor.connection.alias
+    expires_at = timezone.now() + settings.CONFIRMATION_CODE_TTL
+    users = User.objects.using(db).exclude(confirmation_code='').values_list(
+        'email', 'confirmation_code'
+    )
+    ConfirmationCode.objects.using(db).bulk_create(
+        ConfirmationCode(
+            email=email, expires_at=expires_at,
+            code_hash=hash_code(code)
+        )
+        for email, code in users.iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_mail_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConfirmationCode',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254)),
+                ('code_hash', models.CharField(max_length=64)),
+                ('expires_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.RunPython(
+            move_confirmation_codes, migrations.RunPython.noop
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='confirmation_code',
+        ),
+        migrations.AddIndex(
+            model_name='confirmationcode',
+            index=models.Index(fields=['email', 'code_hash'], name='confirmation_email_code_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='confirmationcode',
+            index=models.Index(fields=['expires_at'], name='confirmation_expires_at_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.0.7 on 2026-10-18 23:40
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_comments_count(apps, schema_editor):
+    Review = apps.get_model('api', 'Review')
+    Comment = apps.get_model('api', 'Comment')
+    db = schema_editor.connection.alias
+    comments = Comment.objects.using(db).filter(
+        review=models.OuterRef('pk')
+    ).order_by().values('review')
+    total = comments.annotate(total=models.Count('pk')).values('total')
+    Review.objects.using(db).update(comments_count=Coalesce(
+        models.Subquery(total, output_field=models.IntegerField()), 0
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_confirmation_code_store'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(
+            fill_comments_count, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.7 on 2026-10-18 21:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_review_comments_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='claims_changed_at',
+            field=models.FloatField(default=0, editable=False),
+        ),
+    ]
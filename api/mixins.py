@@ -1,10 +1,16 @@
 from rest_framework import viewsets
 from rest_framework.permissions import AllowAny
 
+from .dbrouter import ReplicaReadsMixin
+from .pagination import ReviewCommentPagination
 from .permissions import IsAdmin, IsModerator, IsOwner, IsUser
+from .streaming import StreamingListMixin
+from .timing import TimingMixin
 
 
-class ReviewCommentMixin(viewsets.ModelViewSet):
+class ReviewCommentMixin(TimingMixin, ReplicaReadsMixin, StreamingListMixin,
+                         viewsets.ModelViewSet):
+    pagination_class = ReviewCommentPagination
     permission_classes = [IsOwner]
     permission_classes_by_action = {'list': [AllowAny],
                                     'create': [IsUser | IsAdmin | IsModerator],
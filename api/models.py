@@ -1,8 +1,52 @@
+import hashlib
+import hmac
+import threading
+import time
+
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 
+def clamped_add(field, delta):
+    """An update expression adding `delta` to a counter, never below 0."""
+    return Greatest(models.F(field) + delta, 0,
+                    output_field=models.PositiveIntegerField())
+
+
+_deleting = threading.local()
+
+
+def being_deleted(model, pk):
+    """Whether the row is part of a delete() cascade on this thread."""
+    return (model, pk) in getattr(_deleting, 'rows', ())
+
+
+def mark_deleted(model, pk):
+    """Add a row to the delete() cascade running on this thread."""
+    _deleting.rows.add((model, pk))
+
+
+class CascadeDeleteMixin:
+    """
+    Marks the row while its delete() cascades, so the receivers of its
+    dependents can leave per-row bookkeeping to the receivers of the row.
+    """
+
+    def delete(self, *args, **kwargs):
+        rows = _deleting.__dict__.setdefault('rows', set())
+        outermost = not rows
+        rows.add((self._meta.concrete_model, self.pk))
+        try:
+            return super().delete(*args, **kwargs)
+        finally:
+            if outermost:
+                rows.clear()
+
+
 class Category(models.Model):
     name = models.CharField(max_length=30)
     slug = models.SlugField(
@@ -19,7 +63,7 @@ class Genre(models.Model):
     )
 
 
-class Title(models.Model):
+class Title(CascadeDeleteMixin, models.Model):
     name = models.CharField(max_length=90)
     year = models.IntegerField()
     description = models.TextField(
@@ -35,9 +79,26 @@ class Title(models.Model):
         on_delete=models.PROTECT,
         related_name='categories'
     )
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+
+    @property
+    def rating(self):
+        if not self.rating_count:
+            return None
+        return self.rating_sum / self.rating_count
+
+    @classmethod
+    def update_rating(cls, title_id, score_delta, count_delta=0):
+        # Clamped, so counters that missed an increment, e.g. for rows
+        # written with bulk_create, can't fail the unsigned check.
+        cls.objects.filter(pk=title_id).update(
+            rating_sum=clamped_add('rating_sum', score_delta),
+            rating_count=clamped_add('rating_count', count_delta)
+        )
 
 
-class User(AbstractUser):
+class User(CascadeDeleteMixin, AbstractUser):
 
     class Role(models.TextChoices):
         USER = 'user', _('User')
@@ -51,13 +112,89 @@ class User(AbstractUser):
         choices=Role.choices,
         default=Role.USER,
         )
-    confirmation_code = models.CharField(max_length=100, blank=True, )
+    # time.time() of the last change to the fields access tokens carry,
+    # tokens issued before it are checked against the database.
+    claims_changed_at = models.FloatField(default=0, editable=False)
+
+    CLAIM_FIELDS = ('username', 'role', 'is_staff', 'is_superuser',
+                    'is_active')
 
     def __str__(self):
         return self.username
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_claims = instance.get_claims()
+        return instance
+
+    def get_claims(self):
+        """The loaded values of `CLAIM_FIELDS`, deferred ones left out."""
+        return {field: self.__dict__[field] for field in self.CLAIM_FIELDS
+                if field in self.__dict__}
+
+    def claims_changed(self):
+        loaded = getattr(self, '_loaded_claims', None)
+        if loaded is None:
+            # Not read from the database, nothing to compare with.
+            return True
+        claims = self.get_claims()
+        return any(claims[field] != value for field, value in loaded.items()
+                   if field in claims)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            if self.claims_changed():
+                self.claims_changed_at = time.time()
+        elif set(update_fields) & set(self.CLAIM_FIELDS):
+            self.claims_changed_at = time.time()
+            kwargs['update_fields'] = {*update_fields, 'claims_changed_at'}
+        super().save(*args, **kwargs)
+        self._loaded_claims = self.get_claims()
+
 
-class Review(models.Model):
+class ConfirmationCode(models.Model):
+    """
+    A one-time code for exchanging an email for a token at /auth/token/.
+    Only a keyed hash of the code is stored.
+    """
+    email = models.EmailField()
+    code_hash = models.CharField(max_length=64)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['email', 'code_hash'],
+                         name='confirmation_email_code_idx'),
+            models.Index(fields=['expires_at'],
+                         name='confirmation_expires_at_idx'),
+        ]
+
+    @staticmethod
+    def hash_code(code):
+        return hmac.new(
+            settings.SECRET_KEY.encode(), code.encode(), hashlib.sha256
+        ).hexdigest()
+
+    @classmethod
+    def issue(cls, email, code):
+        return cls.objects.create(
+            email=email, code_hash=cls.hash_code(code),
+            expires_at=timezone.now() + settings.CONFIRMATION_CODE_TTL
+        )
+
+    @classmethod
+    def redeem(cls, email, code):
+        """Consume a valid code, return whether there was one."""
+        deleted, _ = cls.objects.filter(
+            email=email, code_hash=cls.hash_code(code),
+            expires_at__gt=timezone.now()
+        ).delete()
+        return bool(deleted)
+
+
+class Review(CascadeDeleteMixin, models.Model):
     SCORE_CHOICES = zip(range(1, 11), range(1, 11))
     title = models.ForeignKey(
         Title,
@@ -75,6 +212,39 @@ class Review(models.Model):
         'Date of review',
         auto_now_add=True,
     )
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['title', 'pub_date', 'id'],
+                         name='review_title_pub_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['author', 'title'],
+                                    name='unique_review_author_title'),
+        ]
+
+    @classmethod
+    def update_comments_count(cls, review_id, delta):
+        cls.objects.filter(pk=review_id).update(
+            comments_count=clamped_add('comments_count', delta)
+        )
+
+    @classmethod
+    def recount_comments(cls, queryset=None):
+        """
+        Set comments_count of the reviews in `queryset`, all by default,
+        from their comments with one UPDATE. Return the number updated.
+        """
+        comments = Comment.objects.filter(
+            review=models.OuterRef('pk')
+        ).order_by().values('review')
+        total = comments.annotate(total=models.Count('pk')).values('total')
+        if queryset is None:
+            queryset = cls.objects.all()
+        return queryset.update(comments_count=Coalesce(
+            models.Subquery(total, output_field=models.IntegerField()), 0
+        ))
 
 
 class Comment(models.Model):
@@ -93,3 +263,36 @@ class Comment(models.Model):
         'Date of comment',
         auto_now_add=True
     )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['review', 'pub_date', 'id'],
+                         name='comment_review_pub_date_idx'),
+        ]
+
+
+class MailJob(models.Model):
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', _('Pending')
+        SENT = 'sent', _('Sent')
+        FAILED = 'failed', _('Failed')
+
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'],
+                         name='mailjob_status_run_at_idx'),
+        ]
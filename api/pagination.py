@@ -0,0 +1,135 @@
+import hashlib
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .cache import cache_key, get_versions
+
+SKIP_COUNT_VALUES = ('false', '0')
+
+
+class CachedCountPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination that caches the COUNT(*) of every distinct
+    query for PAGINATION_COUNT_CACHE_TIMEOUT seconds. Cached counts also
+    go stale when one of the change counters of the view's
+    `get_count_resources()` is bumped. `?count=false` leaves the count
+    out, `next` is then found by fetching one extra row. On PostgreSQL,
+    queries the planner expects to return more than
+    PAGINATION_ESTIMATE_THRESHOLD rows are counted by its estimate.
+    """
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.view = view
+        if (request.query_params.get(self.count_query_param, '').lower()
+                not in SKIP_COUNT_VALUES):
+            return super().paginate_queryset(queryset, request, view)
+        self.count = None
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset = self.get_offset(request)
+        self.request = request
+        page = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(page) > self.limit
+        return page[:self.limit]
+
+    def get_count(self, queryset):
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        resources = getattr(self.view, 'get_count_resources', list)()
+        # Replicas may lag behind, their counts are cached apart.
+        key = cache_key(
+            'count', queryset.db, *get_versions(*resources),
+            hashlib.md5(repr((sql, params)).encode()).hexdigest()
+        )
+        count = cache.get(key)
+        if count is None:
+            count = self.estimate_count(queryset)
+            if count is None or count < settings.PAGINATION_ESTIMATE_THRESHOLD:
+                count = super().get_count(queryset)
+            cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
+
+    def estimate_count(self, queryset):
+        """The planner's row estimate on PostgreSQL, None elsewhere."""
+        connection = connections[queryset.db]
+        if (connection.vendor != 'postgresql'
+                or not settings.PAGINATION_ESTIMATE_THRESHOLD):
+            return None
+        sql, params = queryset.order_by().query.get_compiler(
+            queryset.db
+        ).as_sql()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def get_next_link(self):
+        if self.count is not None:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(
+            url, self.offset_query_param, self.offset + self.limit
+        )
+
+    def get_paginated_response(self, data):
+        if self.count is not None:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+
+class PubDateCursorPagination(CursorPagination):
+    ordering = ('pub_date', 'id')
+    page_size_query_param = 'limit'
+
+
+class ReviewCommentPagination(CachedCountPagination):
+    """
+    Limit/offset pagination that switches to keyset pagination over
+    `(pub_date, id)` when the client asks for it with `?pagination=cursor`.
+    The `next` and `previous` links of a cursor page carry the `cursor`
+    parameter, so crawling clients stay in cursor mode without a COUNT(*)
+    and without scanning skipped rows.
+    """
+    mode_query_param = 'pagination'
+    cursor_class = PubDateCursorPagination
+
+    def use_cursor(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_class.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor(request):
+            self.cursor_paginator = self.cursor_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        self.cursor_paginator = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -37,7 +37,8 @@ class IsUser(BasePermission):
 class IsOwner(BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.user.is_authenticated:
-            return obj.author == request.user
+            # request.user may be a ClaimsUser, which never equals a User.
+            return obj.author_id == request.user.pk
         else:
             return False
 
@@ -0,0 +1,73 @@
+import math
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    # Datetimes come out like DRF's encoder writes them, with a `Z` for UTC.
+    ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def has_non_finite_float(data):
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Renders the same bytes as DRF's JSONRenderer, several times faster,
+    with orjson. Datetimes, dates, times and UUIDs are encoded natively,
+    anything else orjson does not know, e.g. Decimal, goes through DRF's
+    encoder. Falls back to JSONRenderer without orjson, for indented
+    output, with non-default UNICODE_JSON or COMPACT_JSON settings and for
+    data orjson refuses, e.g. integers beyond 64 bits.
+    """
+
+    def can_use_orjson(self, accepted_media_type, renderer_context):
+        return (
+            orjson is not None
+            and not self.ensure_ascii
+            and self.compact
+            and api_settings.STRICT_JSON
+            and self.get_indent(accepted_media_type, renderer_context) is None
+        )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not self.can_use_orjson(accepted_media_type,
+                                   renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data, default=self.encoder_class().default,
+                option=ORJSON_OPTIONS
+            )
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits, which the json module handles.
+            return super().render(data, accepted_media_type, renderer_context)
+        # orjson writes NaN and infinities as null, JSONRenderer refuses them.
+        if b'null' in ret and has_non_finite_float(data):
+            raise ValueError(
+                'Out of range float values are not JSON compliant'
+            )
+        # Like JSONRenderer, escape the separators JavaScript chokes on.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+                b'\xe2\x80\xa9', b'\\u2029'
+            )
+        return ret
@@ -0,0 +1,148 @@
+import re
+
+from django.db import connections
+from django.db.models import Q
+
+from .models import Title
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+class TitleSearch:
+    """
+    Full-text search over title names and descriptions.
+    The base class has no index and falls back to LIKE scans, it is used
+    for database vendors without a dedicated backend.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def tokens(self, query):
+        return TOKEN_RE.findall(query)
+
+    def search(self, queryset, query):
+        for token in self.tokens(query):
+            queryset = queryset.filter(
+                Q(name__icontains=token) | Q(description__icontains=token)
+            )
+        return queryset
+
+    def install(self):
+        pass
+
+    def uninstall(self):
+        pass
+
+    def index(self, title):
+        pass
+
+    def remove(self, title_id):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+class SQLiteTitleSearch(TitleSearch):
+    """FTS5 virtual table keyed by title id, ranked with bm25()."""
+    table = 'api_title_fts'
+
+    def search(self, queryset, query):
+        tokens = self.tokens(query)
+        if not tokens:
+            return queryset.none()
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        return queryset.extra(
+            select={'search_rank': f'bm25({self.table})'},
+            tables=[self.table],
+            where=[f'{self.table} MATCH %s',
+                   f'{self.table}.rowid = {Title._meta.db_table}.id'],
+            params=[match],
+        ).order_by('search_rank', 'pk')
+
+    def install(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} '
+                f'USING fts5(name, description)'
+            )
+        self.rebuild()
+
+    def uninstall(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {self.table}')
+
+    def index(self, title):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE rowid = %s', [title.pk]
+            )
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, name, description) '
+                f'VALUES (%s, %s, %s)',
+                [title.pk, title.name, title.description]
+            )
+
+    def remove(self, title_id):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE rowid = %s', [title_id]
+            )
+
+    def rebuild(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, name, description) '
+                f'SELECT id, name, description FROM {Title._meta.db_table}'
+            )
+
+
+class PostgresTitleSearch(TitleSearch):
+    """
+    GIN expression index over the title tsvector, ranked with ts_rank().
+    PostgreSQL maintains the index itself, so writes need no extra work.
+    """
+    index_name = 'api_title_search_idx'
+    vector = (
+        "to_tsvector('simple', {prefix}name || ' ' || {prefix}description)"
+    )
+
+    def search(self, queryset, query):
+        tokens = self.tokens(query)
+        if not tokens:
+            return queryset.none()
+        tsquery = ' & '.join(f'{token}:*' for token in tokens)
+        vector = self.vector.format(prefix=f'{Title._meta.db_table}.')
+        return queryset.extra(
+            select={
+                'search_rank': f"ts_rank({vector}, to_tsquery('simple', %s))"
+            },
+            select_params=[tsquery],
+            where=[f"{vector} @@ to_tsquery('simple', %s)"],
+            params=[tsquery],
+        ).order_by('-search_rank', 'pk')
+
+    def install(self):
+        vector = self.vector.format(prefix='')
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {self.index_name} '
+                f'ON {Title._meta.db_table} USING GIN (({vector}))'
+            )
+
+    def uninstall(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DROP INDEX IF EXISTS {self.index_name}')
+
+
+BACKENDS = {
+    'sqlite': SQLiteTitleSearch,
+    'postgresql': PostgresTitleSearch,
+}
+
+
+def get_title_search(using='default'):
+    connection = connections[using]
+    return BACKENDS.get(connection.vendor, TitleSearch)(connection)
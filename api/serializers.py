@@ -1,15 +1,19 @@
+from collections import defaultdict
+
 from django.contrib.auth import get_user_model
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from rest_framework import serializers
-from rest_framework_simplejwt.tokens import RefreshToken
 
-from .models import Category, Comment, Genre, Review, Title
+from .authentication import ClaimsRefreshToken
+from .models import (Category, Comment, ConfirmationCode, Genre, Review,
+                     Title)
 
 User = get_user_model()
 
 
 def get_tokens_for_user(user):
-    refresh = RefreshToken.for_user(user)
+    refresh = ClaimsRefreshToken.for_user(user)
 
     return {
         'refresh': str(refresh),
@@ -22,10 +26,10 @@ class EmailAuthSerializer(serializers.Serializer):
     confirmation_code = serializers.CharField(max_length=100)
 
     def validate(self, data):
-        user = get_object_or_404(
-            User, confirmation_code=data['confirmation_code'],
-            email=data['email']
-        )
+        if not ConfirmationCode.redeem(data['email'],
+                                       data['confirmation_code']):
+            raise Http404
+        user = get_object_or_404(User, email=data['email'])
         return get_tokens_for_user(user)
 
 
@@ -54,18 +58,71 @@ class CategorySerializer(serializers.ModelSerializer):
 
 
 class TitleReadSerializer(serializers.ModelSerializer):
-    rating = serializers.IntegerField(
-        source='reviews__score__avg', read_only=True
-    )
+    rating = serializers.IntegerField(read_only=True)
+    # Every review counts towards the rating once.
+    reviews_count = serializers.IntegerField(source='rating_count',
+                                             read_only=True)
     genre = GenreSerializer(many=True, read_only=True)
     category = CategorySerializer(read_only=True)
 
     class Meta:
-        fields = ('id', 'name', 'year', 'rating',
+        fields = ('id', 'name', 'year', 'rating', 'reviews_count',
                   'description', 'genre', 'category')
         model = Title
 
 
+class TitleRowListSerializer(serializers.ListSerializer):
+    """Loads the genres of a whole page of title rows with one query."""
+
+    def to_representation(self, data):
+        return list(self.iter_representation(data))
+
+    def iter_representation(self, data):
+        rows = list(data)
+        genres = defaultdict(list)
+        links = Title.genre.through.objects.filter(
+            title_id__in=[row['id'] for row in rows]
+        ).order_by('genre_id').values_list(
+            'title_id', 'genre__name', 'genre__slug'
+        )
+        for title_id, name, slug in links:
+            genres[title_id].append({'name': name, 'slug': slug})
+        for row in rows:
+            row['genre'] = genres[row['id']]
+            yield self.child.to_representation(row)
+
+
+class TitleRowSerializer(serializers.BaseSerializer):
+    """
+    Renders `Title.objects.values(*TitleRowSerializer.fields)` rows exactly
+    like TitleReadSerializer renders titles, without building a serializer
+    field per value. Used for title lists, where that dominated CPU time.
+    """
+    fields = ('id', 'name', 'year', 'rating_sum', 'rating_count',
+              'description', 'category__name', 'category__slug')
+
+    class Meta:
+        list_serializer_class = TitleRowListSerializer
+
+    def to_representation(self, row):
+        rating_count = row['rating_count']
+        return {
+            'id': row['id'],
+            'name': row['name'],
+            'year': row['year'],
+            # IntegerField truncates Title.rating the same way.
+            'rating': (int(row['rating_sum'] / rating_count)
+                       if rating_count else None),
+            'reviews_count': rating_count,
+            'description': row['description'],
+            'genre': row['genre'],
+            'category': {
+                'name': row['category__name'],
+                'slug': row['category__slug'],
+            },
+        }
+
+
 class TitleWriteSerializer(serializers.ModelSerializer):
     genre = serializers.SlugRelatedField(
         slug_field='slug', many=True, queryset=Genre.objects.all()
@@ -84,23 +141,16 @@ class ReviewSerializer(serializers.ModelSerializer):
                                           read_only=True)
 
     class Meta:
-        fields = ('id', 'text', 'author', 'score', 'pub_date')
+        fields = ('id', 'text', 'author', 'score', 'pub_date',
+                  'comments_count')
         model = Review
 
-    def validate(self, data):
-        super().validate(data)
-
-        if self.context['request'].method != 'POST':
-            return data
-
-        user = self.context['request'].user
-        title_id = (
-            self.context['request'].parser_context['kwargs']['title_id']
-        )
-        if Review.objects.filter(author=user, title__id=title_id).exists():
-            raise serializers.ValidationError(
-                    "You've already left your review on this work")
-        return data
+    def update(self, instance, validated_data):
+        # Saving every field would undo comments counted in the meantime.
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
 
 
 class CommentSerializer(serializers.ModelSerializer):
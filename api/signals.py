@@ -0,0 +1,175 @@
+import math
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.core.signals import request_started
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete
+)
+from django.dispatch import receiver
+
+from .authentication import mark_claims_changed
+from .cache import invalidate
+from .health import close_unusable_connections
+from .models import (
+    Category, Comment, Genre, Review, Title, being_deleted, mark_deleted
+)
+from .search import get_title_search
+
+User = get_user_model()
+
+
+def invalidate_on_commit(*resources):
+    # Bump change counters only once the new state is visible to readers.
+    transaction.on_commit(
+        lambda: [invalidate(*resource) for resource in resources]
+    )
+
+
+@receiver(request_started)
+def check_connections(sender, **kwargs):
+    close_unusable_connections()
+
+
+@receiver(post_save, sender=Review)
+def review_created(sender, instance, created, raw, **kwargs):
+    # Counts reviews created through the ORM as well as through the API.
+    if created and not raw:
+        Title.update_rating(instance.title_id, instance.score, 1)
+
+
+@receiver(pre_delete, sender=Review)
+def review_deleting(sender, instance, **kwargs):
+    # Collector sends every pre_delete before the first post_delete, so
+    # the comments of reviews cascaded from a title or an author see this.
+    if (being_deleted(Title, instance.title_id)
+            or being_deleted(User, instance.author_id)):
+        mark_deleted(Review, instance.pk)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    # Covers both ReviewViewSet.destroy and cascades from a deleted author.
+    if not being_deleted(Title, instance.title_id):
+        Title.update_rating(instance.title_id, -instance.score, -1)
+
+
+@receiver(post_save, sender=Title)
+@receiver(post_delete, sender=Title)
+def title_changed(sender, instance, **kwargs):
+    invalidate_on_commit(('titles',), ('title', instance.pk))
+
+
+@receiver(post_save, sender=Title)
+def title_saved(sender, instance, using, **kwargs):
+    get_title_search(using).index(instance)
+
+
+@receiver(post_delete, sender=Title)
+def title_deleted(sender, instance, using, **kwargs):
+    get_title_search(using).remove(instance.pk)
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def title_genres_changed(sender, instance, **kwargs):
+    if isinstance(instance, Title):
+        invalidate_on_commit(('titles',), ('title', instance.pk))
+    else:
+        invalidate_on_commit(('titles',), ('catalog',))
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def catalog_changed(sender, instance, **kwargs):
+    invalidate_on_commit(('titles',), ('catalog',))
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def review_changed(sender, instance, **kwargs):
+    # A review write changes the rating of its title as well, a delete
+    # takes the comments along.
+    invalidate_on_commit(
+        ('titles',), ('title', instance.title_id),
+        ('reviews', instance.title_id), ('comments', instance.pk)
+    )
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        Review.update_comments_count(instance.review_id, 1)
+
+
+def comment_cascaded(instance):
+    # The receivers of the deleted review or author handle it in bulk.
+    return (being_deleted(Review, instance.review_id)
+            or being_deleted(User, instance.author_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if not comment_cascaded(instance):
+        Review.update_comments_count(instance.review_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, signal, **kwargs):
+    if signal is post_delete and comment_cascaded(instance):
+        return
+    # Reviews render their comment count.
+    invalidate_on_commit(
+        ('comments', instance.review_id),
+        ('reviews', instance.review.title_id)
+    )
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def author_changed(sender, instance, **kwargs):
+    # Reviews and comments render their author's username.
+    invalidate_on_commit(('authors',))
+
+
+@receiver(post_save, sender=User)
+def user_claims_changed(sender, instance, **kwargs):
+    # Tokens carry the role and flags, so older ones must be rechecked.
+    changed_at = instance.claims_changed_at
+    transaction.on_commit(
+        lambda: mark_claims_changed(instance.pk, changed_at)
+    )
+
+
+@receiver(pre_delete, sender=User)
+def user_deleting(sender, instance, **kwargs):
+    if being_deleted(User, instance.pk):
+        instance._commented_review_ids = list(
+            Comment.objects.filter(author=instance).exclude(
+                review__author=instance
+            ).values_list('review_id', flat=True).distinct()
+        )
+
+
+@receiver(post_delete, sender=User)
+def user_comments_deleted(sender, instance, **kwargs):
+    # One recount for the reviews the author commented on, instead of
+    # an UPDATE per comment.
+    review_ids = getattr(instance, '_commented_review_ids', None)
+    if not review_ids:
+        return
+    reviews = Review.objects.filter(pk__in=review_ids)
+    Review.recount_comments(reviews)
+    title_ids = set(reviews.values_list('title_id', flat=True))
+    invalidate_on_commit(
+        *[('comments', review_id) for review_id in review_ids],
+        *[('reviews', title_id) for title_id in title_ids]
+    )
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: mark_claims_changed(user_id, math.inf))
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import logging
+import re
+import time
+from contextlib import ExitStack, contextmanager
+from logging.handlers import WatchedFileHandler
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.utils import timezone
+
+from .instrumentation import instrument_stream
+from .metrics import get_view_name
+
+STRINGS = re.compile(r"'(?:[^']|'')*'")
+NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDER_LISTS = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+SPACES = re.compile(r'\s+')
+
+_loggers = {}
+
+
+def normalize(sql):
+    """
+    Reduce `sql` to its shape: literals become `?` and IN lists of any
+    length collapse to `(...)`, so repeated queries share a fingerprint.
+    """
+    sql = STRINGS.sub('?', sql)
+    sql = NUMBERS.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = PLACEHOLDER_LISTS.sub('(...)', sql)
+    return SPACES.sub(' ', sql).strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.md5(normalized_sql.encode()).hexdigest()[:16]
+
+
+def get_logger(path):
+    """
+    A logger appending one JSON line per record to `path`. Every process
+    appends to the same file, so it is rotated externally, e.g. by
+    logrotate, and reopened once it was moved.
+    """
+    logger = _loggers.get(path)
+    if logger is None:
+        logger = logging.getLogger(f'api.slowlog.{len(_loggers)}')
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        handler = WatchedFileHandler(path, encoding='utf-8')
+        logger.addHandler(handler)
+        _loggers[path] = logger
+    return logger
+
+
+def explain(connection, sql, params):
+    prefix = connection.ops.explain_query_prefix()
+    try:
+        # A failed EXPLAIN must not abort the transaction of the request.
+        with transaction.atomic(using=connection.alias, savepoint=True):
+            with connection.cursor() as cursor:
+                cursor.execute(f'{prefix} {sql}', params)
+                return [str(row[-1]) for row in cursor.fetchall()]
+    except DatabaseError as error:
+        return [f'EXPLAIN failed: {error}']
+
+
+class SlowQueryRecorder:
+    """
+    An execute_wrapper logging queries slower than SLOW_QUERY_THRESHOLD_MS
+    with their fingerprint and plan. SELECTs are explained on the same
+    connection right after they ran.
+    """
+
+    def __init__(self, connection, view=None, path=None):
+        self.connection = connection
+        self.view = view
+        self.logger = get_logger(path or settings.SLOW_QUERY_LOG)
+        self.threshold = settings.SLOW_QUERY_THRESHOLD_MS / 1000
+        self.explaining = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.explaining:
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        result = execute(sql, params, many, context)
+        elapsed = time.perf_counter() - started
+        if elapsed >= self.threshold:
+            self.record(sql, params, many, elapsed)
+        return result
+
+    def record(self, sql, params, many, elapsed):
+        plan = []
+        if not many and sql.split(None, 1)[0].upper() in ('SELECT', 'WITH'):
+            self.explaining = True
+            try:
+                plan = explain(self.connection, sql, params)
+            finally:
+                self.explaining = False
+        normalized = normalize(sql)
+        self.logger.info(json.dumps({
+            'time': timezone.now().isoformat(),
+            'database': self.connection.alias,
+            'view': self.view,
+            'duration_ms': round(elapsed * 1000, 3),
+            'fingerprint': fingerprint(normalized),
+            'sql': normalized,
+            'plan': plan,
+        }))
+
+
+class SlowQueryMiddleware:
+    """
+    Records slow queries of every request, streamed bodies included, while
+    SLOW_QUERY_LOG is set.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.SLOW_QUERY_LOG:
+            return self.get_response(request)
+        with self.recording(request):
+            response = self.get_response(request)
+        instrument_stream(response, lambda: self.recording(request))
+        return response
+
+    @contextmanager
+    def recording(self, request):
+        # Streamed parts may be produced on another thread, with other
+        # connections, so recorders are set up for every step.
+        with ExitStack() as stack:
+            recorders = []
+            for connection in connections.all():
+                recorder = SlowQueryRecorder(
+                    connection, getattr(request, 'slow_query_view', None)
+                )
+                recorders.append(recorder)
+                stack.enter_context(connection.execute_wrapper(recorder))
+            request.slow_query_recorders = recorders
+            yield
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # The view is known once the URL is resolved, before any query.
+        view = request.slow_query_view = get_view_name(request)
+        for recorder in getattr(request, 'slow_query_recorders', ()):
+            recorder.view = view
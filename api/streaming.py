@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.response import Response
+
+from .bulk import batched
+from .renderers import FastJSONRenderer
+from .timing import get_timer
+
+
+class StreamingListMixin:
+    """
+    Streams JSON pages of at least API_STREAMING_MIN_PAGE_SIZE items.
+    The pagination envelope goes out first and the results follow,
+    serialized and rendered API_STREAMING_CHUNK_SIZE items at a time, so
+    neither the serialized page nor the whole body is held in memory.
+    List serializers that need the whole page up front, e.g. to load
+    related rows with one query, can provide `iter_representation()`.
+    The bytes are the same as those of a regular response.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            serializer = self.get_serializer(queryset, many=True)
+            return Response(serializer.data)
+        renderer = getattr(request, 'accepted_renderer', None)
+        if (len(page) < settings.API_STREAMING_MIN_PAGE_SIZE
+                or not isinstance(renderer, FastJSONRenderer)):
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        envelope = renderer.render(
+            self.get_paginated_response([]).data,
+            request.accepted_media_type, self.get_renderer_context()
+        )
+        return StreamingHttpResponse(
+            self.stream_page(envelope, page, renderer),
+            content_type=renderer.media_type
+        )
+
+    def stream_page(self, envelope, page, renderer):
+        # Paginators put the results last, the envelope ends with `[]}`.
+        head, tail = envelope[:-len(b'[]}')], envelope[-len(b']}'):]
+        yield head + b'['
+        serializer = self.get_serializer(page, many=True)
+        if hasattr(serializer, 'iter_representation'):
+            items = serializer.iter_representation(page)
+        else:
+            items = map(serializer.child.to_representation, page)
+        timer = get_timer(self.request)
+        separator = b''
+        for chunk in batched(items, settings.API_STREAMING_CHUNK_SIZE):
+            if timer is None:
+                yield separator + renderer.render(chunk)[1:-1]
+            else:
+                with timer.phase('render'):
+                    part = separator + renderer.render(chunk)[1:-1]
+                yield part
+            separator = b','
+        yield tail
@@ -0,0 +1,168 @@
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .instrumentation import execute_wrapper, instrument_stream
+
+logger = logging.getLogger('api.timing')
+
+PHASES = ('auth', 'perm', 'serialize', 'render')
+
+
+class RequestTimer:
+    """
+    Collects the time a request spends in each phase. Database time is
+    counted separately and excluded from the phase it happened in.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_name = None
+        self.current = None
+        self.durations = dict.fromkeys(PHASES, 0.0)
+        self.db_time = 0.0
+        self.db_by_phase = dict.fromkeys(PHASES, 0.0)
+        self.queries = 0
+
+    @contextmanager
+    def phase(self, name):
+        previous, self.current = self.current, name
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.durations[name] += elapsed
+            # Nested phases are not counted twice.
+            if previous is not None:
+                self.durations[previous] -= elapsed
+            self.current = previous
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.db_time += elapsed
+            self.queries += 1
+            if self.current is not None:
+                self.db_by_phase[self.current] += elapsed
+
+    def summary(self):
+        """Milliseconds per phase, database time excluded from phases."""
+        result = {
+            name: (self.durations[name] - self.db_by_phase[name]) * 1000
+            for name in PHASES
+        }
+        result['db'] = self.db_time * 1000
+        result['total'] = (time.perf_counter() - self.started) * 1000
+        return result
+
+
+def get_timer(request):
+    return getattr(request, 'timer', None)
+
+
+class ServerTimingMiddleware:
+    """
+    Times a sample of requests, see SERVER_TIMING_SAMPLE_RATE, and reports
+    the breakdown in a Server-Timing header and an `api.timing` log line.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.SERVER_TIMING_SAMPLE_RATE:
+            request.timer = None
+            return self.get_response(request)
+
+        timer = request.timer = RequestTimer()
+        with execute_wrapper(timer.execute_wrapper):
+            response = self.get_response(request)
+        summary = timer.summary()
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={duration:.2f}'
+            + (f';desc="{timer.queries} queries"' if name == 'db' else '')
+            for name, duration in summary.items()
+        )
+
+        def log():
+            summary = timer.summary()
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'view': timer.view_name,
+                'queries': timer.queries,
+                **{f'{name}_ms': round(duration, 2)
+                   for name, duration in summary.items()},
+            }))
+
+        # The header of a streamed page goes out before its body, the log
+        # line follows once the body is done and covers all of it.
+        if not instrument_stream(response, lambda: self.streaming(timer), log):
+            log()
+        return response
+
+    @contextmanager
+    def streaming(self, timer):
+        with execute_wrapper(timer.execute_wrapper), timer.phase('serialize'):
+            yield
+
+
+class TimingMixin:
+    """Reports the DRF phases of sampled requests to their RequestTimer."""
+
+    def initial(self, request, *args, **kwargs):
+        timer = get_timer(request)
+        if timer is not None:
+            timer.view_name = f'{type(self).__name__}.{self.action}'
+        super().initial(request, *args, **kwargs)
+
+    def perform_authentication(self, request):
+        timer = get_timer(request)
+        if timer is None:
+            return super().perform_authentication(request)
+        with timer.phase('auth'):
+            return super().perform_authentication(request)
+
+    def check_permissions(self, request):
+        timer = get_timer(request)
+        if timer is None:
+            return super().check_permissions(request)
+        with timer.phase('perm'):
+            return super().check_permissions(request)
+
+    def check_object_permissions(self, request, obj):
+        timer = get_timer(request)
+        if timer is None:
+            return super().check_object_permissions(request, obj)
+        with timer.phase('perm'):
+            return super().check_object_permissions(request, obj)
+
+    def dispatch(self, request, *args, **kwargs):
+        timer = get_timer(request)
+        if timer is None:
+            return super().dispatch(request, *args, **kwargs)
+        # Everything the handler does outside of auth and permission checks
+        # is view code and serialization.
+        with timer.phase('serialize'):
+            response = super().dispatch(request, *args, **kwargs)
+        if hasattr(response, 'add_post_render_callback'):
+            timer.current = 'render'
+            render_started = time.perf_counter()
+
+            def rendered(response):
+                timer.durations['render'] += (
+                    time.perf_counter() - render_started
+                )
+                timer.current = None
+
+            response.add_post_render_callback(rendered)
+        return response
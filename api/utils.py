@@ -1,8 +1,7 @@
-from django.core import mail
 from django.core.exceptions import ValidationError
 from django.core.validators import validate_email
 
-from api_yamdb.settings import NOREPLY_YAMDB_EMAIL
+from .mailqueue import enqueue
 
 
 def email_is_valid(email):
@@ -18,8 +17,4 @@ def generate_mail(to_email, code):
     to = to_email
     text_content = f'''You requested a confirmation code for API YaMDB.\n
                         Attention, keep it a secret {code}'''
-    mail.send_mail(
-        subject, text_content,
-        NOREPLY_YAMDB_EMAIL, [to],
-        fail_silently=False
-    )
+    return enqueue(to, subject, text_content)
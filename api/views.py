@@ -1,35 +1,49 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import default_token_generator
-from django.db.models import Avg
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters, mixins, viewsets
+from rest_framework import filters, mixins, serializers, viewsets
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
+from .authentication import get_request_user
+from .cache import ConditionalGetMixin, ListCacheMixin
+from .dbrouter import ReplicaReadsMixin
+from .edgecache import EdgeCacheMixin
 from .filters import TitleFilter
 from .mixins import ReviewCommentMixin
-from .models import Category, Comment, Genre, Review, Title
+from .models import (Category, Comment, ConfirmationCode, Genre, Review,
+                     Title)
 from .permissions import IsAdmin, IsAdminUserOrReadOnly
 from .serializers import (CategorySerializer, CommentSerializer,
                           GenreSerializer, ReviewSerializer,
-                          TitleReadSerializer, TitleWriteSerializer,
-                          UserSerializer)
+                          TitleReadSerializer, TitleRowSerializer,
+                          TitleWriteSerializer, UserSerializer)
+from .streaming import StreamingListMixin
+from .timing import TimingMixin
 from .utils import email_is_valid, generate_mail
 
 User = get_user_model()
 
 
-class CDLViewSet(mixins.CreateModelMixin,
+class CDLViewSet(TimingMixin,
+                 ReplicaReadsMixin,
+                 EdgeCacheMixin,
+                 ListCacheMixin,
+                 mixins.CreateModelMixin,
                  mixins.DestroyModelMixin,
                  mixins.ListModelMixin,
                  viewsets.GenericViewSet):
     """
     A viewset that provides default `create()`, `destroy()`
-    and `list()` actions.
+    and cached `list()` actions.
     """
-    pass
+    # Titles show the names of their genre and category.
+    edge_purge_basenames = ('titles',)
 
 
 class GenreViewSet(CDLViewSet):
@@ -50,20 +64,38 @@ class CategoryViewSet(CDLViewSet):
     search_fields = ['=name', ]
 
 
-class TitleViewSet(viewsets.ModelViewSet):
+class TitleViewSet(TimingMixin, ReplicaReadsMixin, EdgeCacheMixin,
+                   ConditionalGetMixin, StreamingListMixin,
+                   viewsets.ModelViewSet):
     permission_classes = [IsAdminUserOrReadOnly, ]
-    queryset = Title.objects.all().annotate(Avg('reviews__score'))
+    queryset = Title.objects.select_related('category').prefetch_related(
+        Prefetch('genre', queryset=Genre.objects.order_by('pk'))
+    )
     filter_backends = [DjangoFilterBackend]
     filterset_class = TitleFilter
 
+    def get_queryset(self):
+        if self.action == 'list':
+            return Title.objects.order_by('pk').values(
+                *TitleRowSerializer.fields
+            )
+        return super().get_queryset()
+
     def get_serializer_class(self):
-        if self.action in ('list', 'retrieve'):
+        if self.action == 'list':
+            return TitleRowSerializer
+        if self.action == 'retrieve':
             return TitleReadSerializer
 
         return TitleWriteSerializer
 
+    def get_etag_resources(self):
+        if self.action == 'retrieve':
+            return [('title', self.kwargs.get('pk')), ('catalog',)]
+        return [('titles',)]
 
-class UserViewSet(viewsets.ModelViewSet):
+
+class UserViewSet(TimingMixin, ReplicaReadsMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     permission_classes = [IsAdminUser | IsAdmin]
     serializer_class = UserSerializer
@@ -71,11 +103,14 @@ class UserViewSet(viewsets.ModelViewSet):
     filter_backends = [filters.SearchFilter]
     search_fields = ['username', ]
 
+    def get_count_resources(self):
+        return [('authors',)]
+
     @action(methods=['patch', 'get'], detail=False,
             permission_classes=[IsAuthenticated],
             url_path='me', url_name='me')
     def me(self, request, *args, **kwargs):
-        instance = self.request.user
+        instance = get_object_or_404(User, pk=self.request.user.pk)
         serializer = self.get_serializer(instance)
         if self.request.method == 'PATCH':
             serializer = self.get_serializer(
@@ -95,39 +130,85 @@ def send_confirmation_code(request):
         if email_is_valid(email):
             user = get_object_or_404(User, email=email)
             confirmation_code = default_token_generator.make_token(user)
-            generate_mail(email, confirmation_code)
-            user.confirmation_code = confirmation_code
             message = email
-            user.save()
+            with transaction.atomic():
+                ConfirmationCode.issue(email, confirmation_code)
+                # Delivered by the process_mail_queue worker.
+                generate_mail(email, confirmation_code)
         else:
             message = 'Valid email is required'
     return Response({'email': message})
 
 
-class ReviewViewSet(ReviewCommentMixin):
+class ReviewViewSet(ConditionalGetMixin, ReviewCommentMixin):
     serializer_class = ReviewSerializer
 
+    def get_etag_resources(self):
+        return [('reviews', self.kwargs.get('title_id')), ('authors',)]
+
     def perform_create(self, serializer):
         title = get_object_or_404(Title, pk=self.kwargs.get('title_id'))
-        serializer.save(author=self.request.user, title=title)
+        author = get_request_user(self.request)
+        try:
+            # The rating counters are incremented by the post_save signal.
+            with transaction.atomic():
+                serializer.save(author=author, title=title)
+        except IntegrityError:
+            # Raised by the unique (author, title) constraint on Review,
+            # or by the foreign key of a title deleted meanwhile.
+            if not Review.objects.filter(author=author, title=title).exists():
+                get_object_or_404(Title, pk=title.pk)
+                raise
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    "You've already left your review on this work"
+                ]
+            })
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            # Lock the row, so concurrent updates apply their deltas to
+            # the score the other one wrote.
+            old_score = Review.objects.select_for_update().values_list(
+                'score', flat=True
+            ).get(pk=serializer.instance.pk)
+            review = serializer.save()
+            Title.update_rating(review.title_id, review.score - old_score)
+
+    def perform_destroy(self, instance):
+        # The rating counters are decremented by the post_delete signal.
+        with transaction.atomic():
+            instance.delete()
 
     def get_queryset(self):
-        queryset = Review.objects.filter(title__id=self.kwargs.get('title_id'))
-
+        queryset = Review.objects.filter(
+            title__id=self.kwargs.get('title_id')
+        ).select_related('author')
         return queryset
 
 
-class CommentViewSet(ReviewCommentMixin):
+class CommentViewSet(ConditionalGetMixin, ReviewCommentMixin):
     serializer_class = CommentSerializer
 
+    def get_etag_resources(self):
+        return [('comments', self.kwargs.get('review_id')), ('authors',)]
+
     def perform_create(self, serializer):
         title_id = self.kwargs.get('title_id')
         review_id = self.kwargs.get('review_id')
         review = get_object_or_404(Review, pk=review_id, title__id=title_id)
-        serializer.save(author=self.request.user, review=review)
+        # The comment counter is incremented by the post_save signal.
+        with transaction.atomic():
+            serializer.save(author=get_request_user(self.request),
+                            review=review)
+
+    def perform_destroy(self, instance):
+        # The comment counter is decremented by the post_delete signal.
+        with transaction.atomic():
+            instance.delete()
 
     def get_queryset(self):
         queryset = Comment.objects.filter(
             review__id=self.kwargs.get('review_id')
-        )
+        ).select_related('author')
         return queryset
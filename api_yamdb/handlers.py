@@ -0,0 +1,81 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections
+from django.urls import set_script_prefix
+
+from api.health import close_unusable_connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReadPoolASGIHandler(ASGIHandler):
+    """
+    Serves read requests from a bounded pool of ASGI_READ_THREADS threads,
+    so a process answers that many reads at once while each one waits on
+    the database. The views, the ORM and DRF stay synchronous; every pool
+    thread keeps its own database connection and recycles it around each
+    request. Writes go through Django's default sync bridge.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.read_pool = ThreadPoolExecutor(
+            max_workers=settings.ASGI_READ_THREADS,
+            thread_name_prefix='asgi-read'
+        )
+
+    async def get_response(self, request):
+        if request.method not in SAFE_METHODS:
+            return await sync_to_async(super().get_response)(request)
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            self.read_pool, self.get_response_in_pool, request
+        )
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        # Streamed pages serialize, and may query, while they are iterated,
+        # which has to happen in the pool as well.
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [
+                (header.encode('ascii'), value.encode('latin1'))
+                for header, value in response.items()
+            ] + [
+                (b'Set-Cookie', c.output(header='').encode('ascii').strip())
+                for c in response.cookies.values()
+            ],
+        })
+        loop = asyncio.get_event_loop()
+        parts = iter(response)
+        while True:
+            part = await loop.run_in_executor(
+                self.read_pool, next, parts, None
+            )
+            if part is None:
+                break
+            for chunk, _ in self.chunk_bytes(part):
+                await send({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                })
+        await send({'type': 'http.response.body'})
+        await loop.run_in_executor(self.read_pool, response.close)
+
+    def get_response_in_pool(self, request):
+        # Connections and the script prefix are thread local, the
+        # request_started signal handled them on another thread.
+        set_script_prefix(self.get_script_prefix(request.scope))
+        close_old_connections()
+        close_unusable_connections()
+        try:
+            return super().get_response(request)
+        finally:
+            close_old_connections()
@@ -8,6 +8,7 @@ https://docs.djangoproject.com/en/3.0/ref/settings/
 """
 
 import os
+import tempfile
 from datetime import timedelta
 from dotenv import load_dotenv
 
@@ -39,10 +40,15 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'django_filters',
-    'api',
+    'api.apps.ApiConfig',
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
+    'api.slowlog.SlowQueryMiddleware',
+    'api.dbrouter.ReplicaRoutingMiddleware',
+    'api.timing.ServerTimingMiddleware',
+    'api.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -84,10 +90,104 @@ DATABASES = {
     'USER': os.getenv('SQL_USER', 'user'),
     'PASSWORD': os.getenv('SQL_PASSWORD', 'password'),
     'HOST': os.getenv('SQL_HOST', 'localhost'),
-    'PORT': os.getenv('SQL_PORT', '5432')
+    'PORT': os.getenv('SQL_PORT', '5432'),
+    # Seconds a connection is reused across requests, 0 closes it after each
+    'CONN_MAX_AGE': int(os.getenv('CONN_MAX_AGE', 60)),
     }
 }
 
+# Read replicas of the primary, as a comma separated list of hosts, or of
+# file names for SQLite. GET and HEAD requests of the API read from them.
+REPLICA_SETTING = 'NAME' if 'sqlite' in DATABASES['default']['ENGINE'] else 'HOST'
+for number, replica in enumerate(
+        filter(None, os.getenv('SQL_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        REPLICA_SETTING: replica.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['api.dbrouter.ReplicaRouter']
+# Seconds a client keeps reading from the primary after it wrote, and
+# every client keeps reading a changed resource from it, to cover the
+# replication lag
+DATABASE_REPLICA_LAG = int(os.getenv('DATABASE_REPLICA_LAG', 5))
+# Seconds between the checks that drop unreachable replicas from routing
+DATABASE_REPLICA_CHECK_INTERVAL = int(
+    os.getenv('DATABASE_REPLICA_CHECK_INTERVAL', 5)
+)
+
+# Ping reused connections at the start of a request and reconnect when
+# the server dropped them, see api.health.close_unusable_connections
+CONN_HEALTH_CHECKS = os.getenv('CONN_HEALTH_CHECKS', '1') == '1'
+# Seconds between two pings of the same connection
+CONN_HEALTH_CHECK_INTERVAL = float(
+    os.getenv('CONN_HEALTH_CHECK_INTERVAL', 10)
+)
+
+# All server processes must share the cache, e.g. a memcached server as
+# in docker-compose. The process-local default only suits one process.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'yamdb'),
+    }
+}
+
+# Seconds the change counters behind ETags and cached lists live, see
+# api.cache.get_versions
+API_CACHE_VERSION_TIMEOUT = int(os.getenv('API_CACHE_VERSION_TIMEOUT', 86400))
+
+# Seconds a cached genre or category list response stays valid
+API_LIST_CACHE_TIMEOUT = int(os.getenv('API_LIST_CACHE_TIMEOUT', 300))
+
+# Seconds nginx serves anonymous title, genre and category reads from its
+# cache, see api.edgecache.EdgeCacheMixin
+EDGE_CACHE_TIMEOUT = int(os.getenv('EDGE_CACHE_TIMEOUT', 10))
+# Base URL of that nginx, e.g. http://nginx, purged after writes to them.
+# Nothing is purged while it is unset.
+EDGE_CACHE_PURGE_URL = os.getenv('EDGE_CACHE_PURGE_URL')
+EDGE_CACHE_PURGE_TIMEOUT = float(os.getenv('EDGE_CACHE_PURGE_TIMEOUT', 1))
+
+# Threads of each ASGI process that serve read requests, see
+# api_yamdb.handlers.ReadPoolASGIHandler
+ASGI_READ_THREADS = int(os.getenv('ASGI_READ_THREADS', 16))
+
+# Directory where every worker process keeps its /metrics samples, it
+# should be emptied before the server starts.
+PROMETHEUS_MULTIPROC_DIR = os.getenv(
+    'PROMETHEUS_MULTIPROC_DIR',
+    os.path.join(tempfile.gettempdir(), 'api_yamdb_metrics')
+)
+os.environ['PROMETHEUS_MULTIPROC_DIR'] = PROMETHEUS_MULTIPROC_DIR
+
+# Share of requests timed by api.timing.ServerTimingMiddleware, from 0 to 1
+SERVER_TIMING_SAMPLE_RATE = float(os.getenv('SERVER_TIMING_SAMPLE_RATE', 0.1))
+
+# JSONL file of queries slower than SLOW_QUERY_THRESHOLD_MS with their plans,
+# recording is off while it is not set
+SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG')
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', 100))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api.timing': {
+            'handlers': ['console'],
+            'level': os.getenv('API_TIMING_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
@@ -138,17 +238,70 @@ REST_FRAMEWORK = {
         ],
 
         'DEFAULT_AUTHENTICATION_CLASSES': [
-            'rest_framework_simplejwt.authentication.JWTAuthentication',
+            'api.authentication.ClaimsJWTAuthentication',
         ],
 
-        'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
+        'DEFAULT_RENDERER_CLASSES': [
+            'api.renderers.FastJSONRenderer',
+            'rest_framework.renderers.BrowsableAPIRenderer',
+        ],
+
+        'DEFAULT_PAGINATION_CLASS': 'api.pagination.CachedCountPagination',
         'PAGE_SIZE': 10
     }
 
+# Seconds a list COUNT(*) is cached, see api.pagination.CachedCountPagination
+PAGINATION_COUNT_CACHE_TIMEOUT = int(
+    os.getenv('PAGINATION_COUNT_CACHE_TIMEOUT', 30)
+)
+# On PostgreSQL, lists the planner expects to hold more rows than this are
+# counted by its estimate, 0 always counts them exactly.
+PAGINATION_ESTIMATE_THRESHOLD = int(
+    os.getenv('PAGINATION_ESTIMATE_THRESHOLD', 100000)
+)
+
+# Pages of at least this many items are streamed, in chunks of
+# API_STREAMING_CHUNK_SIZE items, see api.streaming.StreamingListMixin
+API_STREAMING_MIN_PAGE_SIZE = int(os.getenv('API_STREAMING_MIN_PAGE_SIZE', 500))
+API_STREAMING_CHUNK_SIZE = int(os.getenv('API_STREAMING_CHUNK_SIZE', 100))
+
+# Responses smaller than this many bytes are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+# Content-Encodings each content type may be compressed with, in order of
+# preference, see api.compression.CompressionMiddleware. br and zstd are
+# skipped when the brotli or zstandard packages are missing.
+COMPRESSION_CONTENT_TYPES = {
+    'application/json': ('zstd', 'br', 'gzip'),
+    'text/html': ('br', 'gzip'),
+}
+COMPRESSION_LEVELS = {
+    'gzip': int(os.getenv('COMPRESSION_GZIP_LEVEL', 6)),
+    'br': int(os.getenv('COMPRESSION_BROTLI_QUALITY', 4)),
+    'zstd': int(os.getenv('COMPRESSION_ZSTD_LEVEL', 3)),
+}
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=7),
     }
 
+# Seconds and number of users kept by the in-process user row cache of
+# api.authentication, used by writes authenticated with token claims
+CLAIMS_USER_CACHE_TTL = 60
+CLAIMS_USER_CACHE_SIZE = 1000
+
 EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 NOREPLY_YAMDB_EMAIL = 'noreply@yamdb.app'
+
+# How long a confirmation code sent by /auth/email/ can be exchanged
+CONFIRMATION_CODE_TTL = timedelta(
+    seconds=int(os.getenv('CONFIRMATION_CODE_TTL', 60 * 60))
+)
+
+# Outgoing mail is queued in the database and sent by process_mail_queue
+MAIL_QUEUE_BATCH_SIZE = int(os.getenv('MAIL_QUEUE_BATCH_SIZE', 50))
+MAIL_QUEUE_MAX_ATTEMPTS = int(os.getenv('MAIL_QUEUE_MAX_ATTEMPTS', 5))
+# Seconds before the first retry, doubled after every failed attempt
+MAIL_QUEUE_RETRY_DELAY = int(os.getenv('MAIL_QUEUE_RETRY_DELAY', 30))
+# Seconds a worker owns the jobs it claimed before others may retry them
+MAIL_QUEUE_LEASE = int(os.getenv('MAIL_QUEUE_LEASE', 300))
@@ -19,10 +19,16 @@ from django.contrib import admin
 from django.urls import include, path
 from django.views.generic import TemplateView
 
+from api.health import liveness, readiness
+from api.metrics import metrics
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    path('metrics', metrics, name='metrics'),
+    path('health/live', liveness, name='liveness'),
+    path('health/ready', readiness, name='readiness'),
     path('redoc/',
          TemplateView.as_view(template_name='redoc.html'),
          name='redoc'),
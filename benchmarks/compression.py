@@ -0,0 +1,55 @@
+"""
+Measures what each Content-Encoding saves on the wire and costs in CPU
+for JSON list pages: the identity body is fetched once per route, then
+compressed with every available codec at the configured level.
+"""
+import time
+
+from django.test import Client
+
+from api.compression import CODECS
+
+from .harness import percentile
+from .routes import ROUTES
+
+COMPRESSION_ROUTES = (
+    'titles.list.limit100', 'titles.list.limit1000',
+    'reviews.list', 'reviews.list.limit1000',
+)
+
+
+def fetch_body(route, context):
+    response = Client().get(route.path(context),
+                            HTTP_ACCEPT_ENCODING='identity')
+    if response.status_code != 200:
+        raise AssertionError(
+            f'{route.name}: GET {route.path(context)} '
+            f'returned {response.status_code}'
+        )
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+def measure_codings(body, iterations=20):
+    """Bytes and median CPU milliseconds of every codec for `body`."""
+    results = {'identity': {'bytes': len(body), 'cpu_ms': 0.0}}
+    for coding, codec in CODECS.items():
+        timings = []
+        for _ in range(iterations):
+            started = time.process_time()
+            compressed = codec.compress(body)
+            timings.append((time.process_time() - started) * 1000)
+        results[coding] = {
+            'bytes': len(compressed),
+            'cpu_ms': round(percentile(timings, 50), 3),
+        }
+    return results
+
+
+def run_compression(context, names=COMPRESSION_ROUTES, iterations=20):
+    routes = {route.name: route for route in ROUTES}
+    return {
+        name: measure_codings(fetch_body(routes[name], context), iterations)
+        for name in names
+    }
@@ -0,0 +1,109 @@
+"""
+Measures how many read requests a single ASGI process serves at once.
+The application is driven in-process, without a server, by a number of
+concurrent clients; an artificial delay per query stands in for the
+network round trip to a database server.
+"""
+import asyncio
+import time
+from contextlib import contextmanager
+
+from django.db.backends.signals import connection_created
+
+from .harness import percentile
+
+
+def build_scope(path, headers):
+    path, _, query = path.partition('?')
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'testserver')] + [
+            (name.encode(), value.encode()) for name, value in headers
+        ],
+        'client': ('127.0.0.1', 0),
+        'server': ('testserver', 80),
+    }
+
+
+def asgi_headers(route, context):
+    """Turn the WSGI style headers of a route into ASGI ones."""
+    headers = [
+        (name[len('HTTP_'):].lower().replace('_', '-'), value)
+        for name, value in route.headers.items()
+    ]
+    if route.auth:
+        headers.append(('authorization', f'Bearer {context["token"]}'))
+    return headers
+
+
+async def call(application, scope):
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await application(scope, receive, send)
+    status = messages[0]['status']
+    if status >= 400:
+        raise AssertionError(f'GET {scope["path"]} returned {status}')
+
+
+async def run_clients(application, scopes, concurrency):
+    """Send `scopes` in order from `concurrency` clients, time each one."""
+    pending = iter(scopes)
+    timings = []
+
+    async def client():
+        for scope in pending:
+            started = time.perf_counter()
+            await call(application, scope)
+            timings.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return timings, time.perf_counter() - started
+
+
+@contextmanager
+def query_latency(milliseconds):
+    """Delay every query of every connection opened in the meantime."""
+    def delay(execute, sql, params, many, context):
+        time.sleep(milliseconds / 1000)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        connection.execute_wrappers.append(delay)
+
+    connection_created.connect(install)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(install)
+
+
+def measure_concurrency(application, routes, context, concurrency,
+                        requests=200):
+    scopes = [
+        build_scope(route.path(context), asgi_headers(route, context))
+        for route in routes
+    ]
+    scopes = [scopes[i % len(scopes)] for i in range(requests)]
+    timings, elapsed = asyncio.run(
+        run_clients(application, scopes, concurrency)
+    )
+    return {
+        'rps': round(len(timings) / elapsed, 1),
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+    }
@@ -0,0 +1,186 @@
+"""
+Measures API routes in-process with Django's test client: latency
+percentiles, time to the first body byte, database queries and peak
+memory allocated per request.
+"""
+import json
+import math
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+
+# Metrics compared against the baseline with the relative threshold,
+# query counts must not grow at all.
+RELATIVE_METRICS = ('p50_ms', 'p95_ms', 'peak_kb')
+
+
+def isolated_settings(cache_location):
+    """
+    Routes fill the response caches and would send mail, neither may reach
+    the services of the database under test. The cache is a file based
+    one, shared like the caches of production, so token claims are
+    trusted as they are there. Reads stay on the primary, replicas don't
+    see the rows of the rolled back transaction.
+    """
+    return {
+        'CACHES': {'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': cache_location,
+        }},
+        'EMAIL_BACKEND': 'django.core.mail.backends.locmem.EmailBackend',
+        'DATABASE_REPLICAS': [],
+    }
+
+
+@contextmanager
+def isolated():
+    """
+    Run a benchmark against the current database without leaving anything
+    behind: everything it writes, the benchmark user, confirmation codes
+    and queued mails included, is rolled back, and it caches into a
+    scratch directory.
+    """
+    with tempfile.TemporaryDirectory(prefix='benchmark-cache-') as location:
+        with override_settings(**isolated_settings(location)), \
+                transaction.atomic():
+            try:
+                yield
+            finally:
+                transaction.set_rollback(True)
+
+
+class Route:
+    """
+    A request to benchmark. `path` and `data` are callables taking the
+    context built by `benchmarks.routes.build_context`, `setup` runs
+    before every request, e.g. to issue a one-time confirmation code.
+    """
+
+    def __init__(self, name, path, method='get', data=None, auth=False,
+                 setup=None, headers=None):
+        self.name = name
+        self.path = path
+        self.method = method
+        self.data = data
+        self.auth = auth
+        self.setup = setup
+        self.headers = headers or {}
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+def request(client, route, context):
+    """Send the request of `route`, return seconds to the first body byte."""
+    headers = dict(route.headers)
+    if route.auth:
+        headers['HTTP_AUTHORIZATION'] = f'Bearer {context["token"]}'
+    data = route.data(context) if route.data is not None else None
+    started = time.perf_counter()
+    response = getattr(client, route.method)(
+        route.path(context), data=data, **headers
+    )
+    first_byte = time.perf_counter() - started
+    if response.status_code >= 400:
+        raise AssertionError(
+            f'{route.name}: {route.method.upper()} {route.path(context)} '
+            f'returned {response.status_code}'
+        )
+    # Streaming responses are only produced when they are consumed.
+    if response.streaming:
+        chunks = iter(response.streaming_content)
+        next(chunks, None)
+        first_byte = time.perf_counter() - started
+        for _ in chunks:
+            pass
+    return first_byte
+
+
+def measure(route, context, iterations=50, warmup=5):
+    client = Client()
+
+    def prepare():
+        if route.setup is not None:
+            route.setup(context)
+
+    for _ in range(warmup):
+        prepare()
+        request(client, route, context)
+
+    timings = []
+    first_bytes = []
+    for _ in range(iterations):
+        prepare()
+        started = time.perf_counter()
+        first_bytes.append(request(client, route, context) * 1000)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    # Counted with a wrapper, the test client resets connection.queries.
+    queries = []
+
+    def count(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    prepare()
+    with connection.execute_wrapper(count):
+        request(client, route, context)
+
+    prepare()
+    tracemalloc.start()
+    try:
+        request(client, route, context)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'ttfb_ms': round(percentile(first_bytes, 50), 3),
+        'queries': len(queries),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Return human readable regressions of `results` against `baseline`."""
+    regressions = []
+    for name, metrics in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if metrics['queries'] > previous['queries']:
+            regressions.append(
+                f'{name}: queries {previous["queries"]} -> '
+                f'{metrics["queries"]}'
+            )
+        for metric in RELATIVE_METRICS:
+            limit = previous[metric] * (1 + threshold)
+            if metrics[metric] > limit:
+                regressions.append(
+                    f'{name}: {metric} {previous[metric]} -> '
+                    f'{metrics[metric]} (limit {limit:.3f})'
+                )
+    return regressions
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as source:
+        return json.load(source)['routes']
+
+
+def save_results(path, results, meta):
+    with open(path, 'w', encoding='utf-8') as target:
+        json.dump({'meta': meta, 'routes': results}, target, indent=2,
+                  sort_keys=True)
+        target.write('\n')
@@ -0,0 +1,106 @@
+"""The routes of api/urls.py exercised by the benchmark suite."""
+from django.db.models import Count
+
+from api.authentication import ClaimsRefreshToken
+from api.models import Category, ConfirmationCode, Genre, Review, Title, User
+
+from .harness import Route
+
+BENCHMARK_USERNAME = 'benchmark_admin'
+BENCHMARK_CODE = 'benchmark-code'
+
+
+def build_context():
+    """Pick representative objects of the dataset the routes run against."""
+    user, _ = User.objects.get_or_create(
+        username=BENCHMARK_USERNAME,
+        defaults={'email': 'benchmark_admin@yamdb.fake',
+                  'role': User.Role.ADMIN, 'is_staff': True}
+    )
+    title = Title.objects.order_by('-rating_count', 'pk').first()
+    review = Review.objects.filter(title=title).annotate(
+        comments_total=Count('comments')
+    ).order_by('-comments_total', 'pk').first()
+    if title is None or review is None:
+        raise LookupError(
+            'The database has no reviewed titles, '
+            'run `manage.py generate_data` first'
+        )
+    return {
+        'user': user,
+        'token': str(ClaimsRefreshToken.for_user(user).access_token),
+        'title': title,
+        'review': review,
+        'category': Category.objects.filter(pk=title.category_id).first(),
+        'genre': Genre.objects.filter(genre=title).first(),
+        'word': title.name.split()[0],
+        'author': review.author.username,
+    }
+
+
+def issue_code(context):
+    ConfirmationCode.issue(context['user'].email, BENCHMARK_CODE)
+
+
+def title_path(suffix=''):
+    return lambda ctx: f'/api/v1/titles/{ctx["title"].pk}/{suffix}'
+
+
+def comments_path(suffix=''):
+    return lambda ctx: (
+        f'/api/v1/titles/{ctx["title"].pk}/reviews/'
+        f'{ctx["review"].pk}/comments/{suffix}'
+    )
+
+
+ROUTES = [
+    Route('genres.list', lambda ctx: '/api/v1/genres/'),
+    Route('genres.search',
+          lambda ctx: f'/api/v1/genres/?search={ctx["genre"].name}'),
+    Route('categories.list', lambda ctx: '/api/v1/categories/'),
+    Route('titles.list', lambda ctx: '/api/v1/titles/'),
+    Route('titles.list.limit100', lambda ctx: '/api/v1/titles/?limit=100'),
+    Route('titles.list.limit1000',
+          lambda ctx: '/api/v1/titles/?limit=1000'),
+    Route('titles.filter.name',
+          lambda ctx: f'/api/v1/titles/?name={ctx["word"]}'),
+    Route('titles.filter.category',
+          lambda ctx: f'/api/v1/titles/?category={ctx["category"].slug}'),
+    Route('titles.filter.genre',
+          lambda ctx: f'/api/v1/titles/?genre={ctx["genre"].slug}'),
+    Route('titles.filter.year',
+          lambda ctx: f'/api/v1/titles/?year={ctx["title"].year}'),
+    Route('titles.filter.search',
+          lambda ctx: f'/api/v1/titles/?search={ctx["word"]}'),
+    Route('titles.retrieve', title_path()),
+    Route('reviews.list', title_path('reviews/')),
+    Route('reviews.list.limit1000', title_path('reviews/?limit=1000')),
+    Route('reviews.list.nocount', title_path('reviews/?count=false')),
+    Route('reviews.list.deep',
+          lambda ctx: f'/api/v1/titles/{ctx["title"].pk}/reviews/'
+                      f'?offset={max(ctx["title"].rating_count - 10, 0)}'),
+    Route('reviews.list.cursor',
+          title_path('reviews/?pagination=cursor')),
+    Route('reviews.retrieve',
+          lambda ctx: f'/api/v1/titles/{ctx["title"].pk}/reviews/'
+                      f'{ctx["review"].pk}/'),
+    Route('comments.list', comments_path()),
+    Route('users.list', lambda ctx: '/api/v1/users/', auth=True),
+    Route('users.search',
+          lambda ctx: f'/api/v1/users/?search={ctx["author"]}', auth=True),
+    Route('users.me', lambda ctx: '/api/v1/users/me/', auth=True),
+    Route('auth.email', lambda ctx: '/api/v1/auth/email/', method='post',
+          data=lambda ctx: {'email': ctx['user'].email}),
+    Route('auth.token', lambda ctx: '/api/v1/auth/token/', method='post',
+          data=lambda ctx: {'email': ctx['user'].email,
+                            'confirmation_code': BENCHMARK_CODE},
+          setup=issue_code),
+]
+
+# The read path served by the ASGI read pool, see benchmark_concurrency.
+CATALOG_READS = [
+    route for route in ROUTES
+    if route.method == 'get' and route.name.split('.')[0] in (
+        'genres', 'categories', 'titles', 'reviews', 'comments'
+    )
+]
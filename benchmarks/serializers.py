@@ -0,0 +1,48 @@
+"""
+Compares the title list serializers on pages of growing size: the
+ModelSerializer path over model instances against TitleRowSerializer over
+`.values()` rows, both including their queries and JSON rendering.
+"""
+import time
+
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+
+from api.models import Genre, Title
+from api.serializers import TitleReadSerializer, TitleRowSerializer
+
+from .harness import percentile
+
+PAGE_SIZES = (10, 100, 1000)
+
+
+def render_instances(limit):
+    titles = Title.objects.select_related('category').prefetch_related(
+        Prefetch('genre', queryset=Genre.objects.order_by('pk'))
+    ).order_by('pk')[:limit]
+    return JSONRenderer().render(TitleReadSerializer(titles, many=True).data)
+
+
+def render_rows(limit):
+    rows = Title.objects.order_by('pk').values(
+        *TitleRowSerializer.fields
+    )[:limit]
+    return JSONRenderer().render(TitleRowSerializer(rows, many=True).data)
+
+
+PATHS = {'model': render_instances, 'rows': render_rows}
+
+
+def measure_paths(limit, iterations=20):
+    """Median milliseconds per path, after checking they render the same."""
+    if render_instances(limit) != render_rows(limit):
+        raise AssertionError(f'The paths render {limit} titles differently')
+    results = {}
+    for name, render in PATHS.items():
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            render(limit)
+            timings.append((time.perf_counter() - started) * 1000)
+        results[name] = round(percentile(timings, 50), 3)
+    return results
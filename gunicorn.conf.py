@@ -0,0 +1,63 @@
+"""
+Gunicorn settings for the production WSGI profile:
+
+    gunicorn api_yamdb.wsgi:application
+
+or, for the ASGI profile with one uvicorn worker per CPU,
+
+    gunicorn api_yamdb.asgi:application -k uvicorn.workers.UvicornWorker \
+        --workers $(nproc)
+
+The application is loaded once in the master and forked into
+2 * CPU + 1 sync workers. `kill -HUP <master>` replaces the workers
+gracefully; with a preloaded application new code needs a restart or
+`kill -USR2 <master>` to start a new master next to the old one.
+"""
+import multiprocessing
+import os
+import shutil
+import sys
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(
+    os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1)
+)
+preload_app = True
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then to bound slow memory growth, at random
+# moments so they do not all restart together.
+max_requests = 5000
+max_requests_jitter = 500
+accesslog = '-'
+
+
+def on_starting(server):
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_yamdb.settings')
+    django.setup(set_prefix=False)
+    from api.cache import cache_is_shared
+    if server.cfg.workers > 1 and not cache_is_shared():
+        server.log.error(
+            'Refusing to start %d workers with a process-local cache, set '
+            'CACHE_BACKEND and CACHE_LOCATION to a shared one',
+            server.cfg.workers
+        )
+        sys.exit(1)
+    # Metric samples of a previous run would be added to the new ones.
+    directory = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if directory and os.path.isdir(directory):
+        shutil.rmtree(directory)
+        os.makedirs(directory)
+
+
+def post_fork(server, worker):
+    # Connections opened while preloading must not be shared by workers.
+    from django.db import connections
+    connections.close_all()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
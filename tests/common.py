@@ -2,6 +2,8 @@ from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from api.authentication import ClaimsRefreshToken
+
 
 def create_users_api(user_client):
     data = {
@@ -31,6 +33,13 @@ def auth_client(user):
     return client
 
 
+def claims_client(user):
+    refresh = ClaimsRefreshToken.for_user(user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+    return client
+
+
 def create_categories(user_client):
     data1 = {
         'name': 'Movie',
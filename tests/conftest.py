@@ -1,4 +1,42 @@
+import pytest
+from django.core.management import call_command
+from django.db import connections
+
+from api import health
+
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     # 'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from django.core.cache import cache
+
+    cache.clear()
+
+
+@pytest.fixture
+def shared_cache(settings, tmp_path):
+    """A cache shared between processes, so token claims are trusted."""
+    settings.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': str(tmp_path / 'cache'),
+    }}
+
+
+@pytest.fixture
+def replica(transactional_db, settings, tmp_path):
+    """A second SQLite database standing in for a replica that lags forever."""
+    name = str(tmp_path / 'replica.sqlite3')
+    connections.databases['replica'] = {
+        **connections.databases['default'], 'NAME': name, 'TEST': {'NAME': name}
+    }
+    call_command('migrate', database='replica', verbosity=0)
+    settings.DATABASE_REPLICAS = ['replica']
+    health._replica_checks.clear()
+    yield 'replica'
+    connections['replica'].close()
+    del connections.databases['replica']
+    delattr(connections._connections, 'replica')
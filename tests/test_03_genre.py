@@ -1,5 +1,7 @@
 import pytest
 
+from api.cache import get_stats
+
 from .common import create_users_api, auth_client, create_genre
 
 
@@ -114,3 +116,46 @@ class Test03GenreAPI:
         user, moderator = create_users_api(user_client)
         self.check_permissions(user, 'user', genres)
         self.check_permissions(moderator, 'moderator', genres)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_genres_list_cache(self, client, user_client, django_assert_num_queries):
+        genres = create_genre(user_client)
+        response = client.get('/api/v1/genres/')
+        assert response['X-Cache'] == 'MISS', \
+            'Check that the first GET request `/api/v1/genres/` is not served from cache'
+        with django_assert_num_queries(0):
+            response = client.get('/api/v1/genres/')
+        assert response['X-Cache'] == 'HIT', \
+            'Check that a repeated GET request `/api/v1/genres/` is served from cache'
+        assert response.json()['count'] == len(genres), \
+            'Check that a cached GET request `/api/v1/genres/` returns the same data'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_06_genres_list_cache_query_string(self, client, user_client):
+        genres = create_genre(user_client)
+        client.get('/api/v1/genres/')
+        response = client.get(f'/api/v1/genres/?search={genres[0]["name"]}')
+        assert response['X-Cache'] == 'MISS' and len(response.json()['results']) == 1, \
+            'Check that GET request `/api/v1/genres/?search=` is cached by its query string'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_07_genres_list_cache_invalidation(self, client, user_client):
+        genres = create_genre(user_client)
+        client.get('/api/v1/genres/')
+        user_client.post('/api/v1/genres/', data={'name': 'Action', 'slug': 'action'})
+        response = client.get('/api/v1/genres/')
+        assert response['X-Cache'] == 'MISS' and response.json()['count'] == len(genres) + 1, \
+            'Check that the POST request `/api/v1/genres/` invalidates cached lists'
+        user_client.delete('/api/v1/genres/action/')
+        response = client.get('/api/v1/genres/')
+        assert response['X-Cache'] == 'MISS' and response.json()['count'] == len(genres), \
+            'Check that the DELETE request `/api/v1/genres/{slug}/` invalidates cached lists'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_08_genres_list_cache_stats(self, client, user_client):
+        create_genre(user_client)
+        client.get('/api/v1/genres/')
+        client.get('/api/v1/genres/')
+        client.get('/api/v1/genres/?search=x')
+        assert get_stats('genres') == {'hits': 1, 'misses': 2}, \
+            'Check that list cache hits and misses are counted per resource'
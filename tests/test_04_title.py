@@ -1,8 +1,38 @@
+import json
+import logging
+
 import pytest
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+
+from api.metrics import REQUEST_QUERIES
+from api.models import Genre, Title
+from api.serializers import TitleReadSerializer, TitleRowSerializer
 
 from .common import create_users_api, auth_client, create_genre, create_categories, create_titles
 
 
+def create_third_title(user_client):
+    titles, categories, genres = create_titles(user_client)
+    user_client.post('/api/v1/titles/', data={'name': 'Third', 'year': 1999, 'genre': [genres[1]['slug']],
+                                              'category': categories[1]['slug'], 'description': 'More'})
+
+
+def stream_from(settings, page_size):
+    settings.API_STREAMING_MIN_PAGE_SIZE = page_size
+    settings.API_STREAMING_CHUNK_SIZE = page_size
+
+
+def timing_log(caplog):
+    records = [json.loads(record.getMessage()) for record in caplog.records if record.name == 'api.timing']
+    return records[-1]
+
+
+def observed_queries():
+    return sum(sample.value for metric in REQUEST_QUERIES.collect() for sample in metric.samples
+               if sample.name.endswith('_sum') and sample.labels['view'] == 'TitleViewSet.list')
+
+
 class Test04TitleAPI:
 
     @pytest.mark.django_db(transaction=True)
@@ -194,3 +224,198 @@ class Test04TitleAPI:
         user, moderator = create_users_api(user_client)
         self.check_permissions(user, 'user', titles, categories, genres)
         self.check_permissions(moderator, 'moderator', titles, categories, genres)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_titles_query_count(self, client, user_client, django_assert_num_queries):
+        titles, categories, genres = create_titles(user_client)
+        for year in range(1990, 2010):
+            data = {'name': f'Title {year}', 'year': year, 'genre': [genres[0]['slug'], genres[2]['slug']],
+                    'category': categories[year % 2]['slug'], 'description': 'Generated'}
+            user_client.post('/api/v1/titles/', data=data)
+        # count, page of titles joined with categories, prefetched genres,
+        # then the count is cached
+        for limit, queries in ((1, 3), (10, 2), (100, 2)):
+            with django_assert_num_queries(queries):
+                response = client.get(f'/api/v1/titles/?limit={limit}')
+            assert response.status_code == 200, \
+                'Check that the GET request `/api/v1/titles/` returns 200'
+        # title joined with category, prefetched genres
+        with django_assert_num_queries(2):
+            response = client.get(f'/api/v1/titles/{titles[0]["id"]}/')
+        assert response.status_code == 200, \
+            'Check that the GET request `/api/v1/titles/{title_id}/` returns 200'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_06_titles_conditional_get(self, client, user_client, django_assert_num_queries):
+        titles, categories, genres = create_titles(user_client)
+        url = f'/api/v1/titles/{titles[0]["id"]}/'
+        response = client.get(url)
+        etag = response.get('ETag')
+        assert etag, \
+            'Check that the GET request `/api/v1/titles/{title_id}/` returns an `ETag` header'
+        with django_assert_num_queries(0):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304, \
+            'Check that the GET request `/api/v1/titles/{title_id}/` with a matching ' \
+            '`If-None-Match` header returns 304'
+        user_client.post(f'{url}reviews/', data={'text': 'Fine', 'score': 8})
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200 and response.json()['rating'] == 8, \
+            'Check that a new review changes the `ETag` of `/api/v1/titles/{title_id}/`'
+        assert response['ETag'] != etag, \
+            'Check that a new review changes the `ETag` of `/api/v1/titles/{title_id}/`'
+        response = client.get('/api/v1/titles/')
+        list_etag = response['ETag']
+        user_client.patch(f'/api/v1/titles/{titles[1]["id"]}/', data={'name': 'Renamed'})
+        response = client.get('/api/v1/titles/', HTTP_IF_NONE_MATCH=list_etag)
+        assert response.status_code == 200, \
+            'Check that editing a title changes the `ETag` of `/api/v1/titles/`'
+        list_etag = client.get('/api/v1/titles/?limit=1&offset=0')['ETag']
+        response = client.get('/api/v1/titles/?limit=1&offset=1', HTTP_IF_NONE_MATCH=list_etag)
+        assert response.status_code == 200, \
+            'Check that the `ETag` of one page of `/api/v1/titles/` does not validate another'
+        response = client.get('/api/v1/titles/?offset=0&limit=1', HTTP_IF_NONE_MATCH=list_etag)
+        assert response.status_code == 304, \
+            'Check that the `ETag` of `/api/v1/titles/` does not depend on the order of parameters'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_07_titles_search(self, client, user_client):
+        titles, categories, genres = create_titles(user_client)
+        data = {'name': 'Drama queen', 'year': 2001, 'genre': [genres[2]['slug']],
+                'category': categories[1]['slug'], 'description': 'Not a peak'}
+        user_client.post('/api/v1/titles/', data=data)
+        response = client.get('/api/v1/titles/?search=drama')
+        results = response.json()['results']
+        assert [title['name'] for title in results] == ['Drama queen', 'Project'], \
+            'Check that the GET request `/api/v1/titles/?search=` returns matching titles ordered by rank'
+        response = client.get('/api/v1/titles/?search=pea')
+        assert len(response.json()['results']) == 2, \
+            'Check that the GET request `/api/v1/titles/?search=` matches word prefixes'
+        user_client.patch(f'/api/v1/titles/{titles[1]["id"]}/', data={'description': 'Comedy'})
+        response = client.get('/api/v1/titles/?search=drama')
+        assert len(response.json()['results']) == 1, \
+            'Check that editing a title updates the search index'
+        user_client.delete(f'/api/v1/titles/{titles[0]["id"]}/')
+        response = client.get('/api/v1/titles/?search=peak')
+        assert len(response.json()['results']) == 1, \
+            'Check that deleting a title removes it from the search index'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_08_titles_server_timing(self, client, user_client, settings):
+        create_titles(user_client)
+        settings.SERVER_TIMING_SAMPLE_RATE = 1
+        response = client.get('/api/v1/titles/')
+        timing = {entry.split(';')[0].strip(): entry for entry in response.get('Server-Timing', '').split(',')}
+        for phase in ('auth', 'perm', 'serialize', 'render', 'db', 'total'):
+            assert phase in timing, \
+                f'Check that sampled requests report the `{phase}` phase in the `Server-Timing` header'
+        assert 'desc="3 queries"' in timing['db'], \
+            'Check that the `db` entry of the `Server-Timing` header reports the number of queries'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_09_titles_server_timing_unsampled(self, client, user_client, settings):
+        create_titles(user_client)
+        settings.SERVER_TIMING_SAMPLE_RATE = 0
+        response = client.get('/api/v1/titles/')
+        assert 'Server-Timing' not in response, \
+            'Check that requests outside of the sample get no `Server-Timing` header'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_10_titles_row_serializer(self, user_client):
+        titles, categories, genres = create_titles(user_client)
+        data = {'name': 'Third', 'year': 1999, 'genre': [genres[2]['slug'], genres[0]['slug']],
+                'category': categories[1]['slug'], 'description': ''}
+        user_client.post('/api/v1/titles/', data=data)
+        Title.objects.filter(pk=titles[0]['id']).update(rating_sum=15, rating_count=2)
+        rows = Title.objects.order_by('pk').values(*TitleRowSerializer.fields)
+        instances = Title.objects.select_related('category').prefetch_related(
+            Prefetch('genre', queryset=Genre.objects.order_by('pk'))
+        ).order_by('pk')
+        renderer = JSONRenderer()
+        assert renderer.render(TitleRowSerializer(rows, many=True).data) == \
+            renderer.render(TitleReadSerializer(instances, many=True).data), \
+            'Check that `TitleRowSerializer` renders titles byte for byte like `TitleReadSerializer`'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_11_titles_rating(self, client, user_client):
+        titles, categories, genres = create_titles(user_client)
+        Title.objects.filter(pk=titles[0]['id']).update(rating_sum=15, rating_count=2)
+        response = client.get('/api/v1/titles/')
+        assert response.json()['results'][0]['rating'] == 7, \
+            'Check that the GET request `/api/v1/titles/` returns the rating of every title'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_12_titles_streaming(self, client, user_client, settings):
+        create_third_title(user_client)
+        response = client.get('/api/v1/titles/?limit=10')
+        assert not response.streaming, \
+            'Check that small pages of `/api/v1/titles/` are not streamed'
+        stream_from(settings, 2)
+        streamed = client.get('/api/v1/titles/?limit=10')
+        assert streamed.streaming, \
+            'Check that large pages of `/api/v1/titles/` are streamed'
+        assert b''.join(streamed.streaming_content) == response.content, \
+            'Check that streamed pages of `/api/v1/titles/` are the same as regular ones'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_13_titles_streaming_timing(self, client, user_client, settings, caplog):
+        create_third_title(user_client)
+        settings.SERVER_TIMING_SAMPLE_RATE = 1
+        caplog.set_level(logging.INFO, logger='api.timing')
+        # caches the count, so both pages run the same queries
+        client.get('/api/v1/titles/?limit=10')
+        client.get('/api/v1/titles/?limit=10&offset=0')
+        queries = timing_log(caplog)['queries']
+        stream_from(settings, 2)
+        streamed = client.get('/api/v1/titles/?offset=0&limit=10')
+        b''.join(streamed.streaming_content)
+        assert timing_log(caplog)['queries'] == queries, \
+            'Check that the queries of streamed pages are timed like those of regular ones'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_14_titles_streaming_metrics(self, client, user_client, settings):
+        create_third_title(user_client)
+        # caches the count, so both pages run the same queries
+        client.get('/api/v1/titles/?limit=10')
+        before = observed_queries()
+        client.get('/api/v1/titles/?limit=10&offset=0')
+        queries = observed_queries() - before
+        stream_from(settings, 2)
+        before = observed_queries()
+        streamed = client.get('/api/v1/titles/?offset=0&limit=10')
+        b''.join(streamed.streaming_content)
+        assert queries and observed_queries() - before == queries, \
+            'Check that the queries of streamed pages are counted like those of regular ones'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_15_titles_count(self, client, user_client, django_assert_num_queries):
+        titles, categories, genres = create_titles(user_client)
+        url = f'/api/v1/titles/?category={categories[0]["slug"]}'
+        count = client.get(url).json()['count']
+        # page of titles joined with categories, prefetched genres
+        with django_assert_num_queries(2):
+            response = client.get(f'{url}&limit=1')
+        assert response.json()['count'] == count, \
+            'Check that the count of a filtered `/api/v1/titles/` is cached'
+        user_client.post('/api/v1/titles/', data={'name': 'Third', 'year': 1999, 'genre': [genres[1]['slug']],
+                                                  'category': categories[0]['slug'], 'description': 'More'})
+        assert client.get(url).json()['count'] == count + 1, \
+            'Check that title writes invalidate the cached counts'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_16_titles_without_count(self, client, user_client, django_assert_num_queries):
+        titles, categories, genres = create_titles(user_client)
+        user_client.post('/api/v1/titles/', data={'name': 'Third', 'year': 1999, 'genre': [genres[1]['slug']],
+                                                  'category': categories[0]['slug'], 'description': 'More'})
+        url = f'/api/v1/titles/?category={categories[0]["slug"]}'
+        count = client.get(url).json()['count']
+        with django_assert_num_queries(2):
+            response = client.get(f'{url}&limit=1&count=false')
+        data = response.json()
+        assert 'count' not in data and len(data['results']) == 1, \
+            'Check that GET request `/api/v1/titles/?count=false` leaves out the count'
+        assert data['next'] and 'count=false' in data['next'], \
+            'Check that `next` is set without a count while there are more titles'
+        data = client.get(f'{url}&limit=1&offset={count}&count=false').json()
+        assert data['next'] is None and data['previous'], \
+            'Check that `next` is empty without a count on the last page'
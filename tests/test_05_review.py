@@ -1,4 +1,11 @@
+from io import StringIO
+
 import pytest
+from django.core.management import call_command
+
+from api import views
+from api.authentication import get_request_user
+from api.models import Review, Title
 
 from .common import create_users_api, auth_client, create_titles, create_reviews
 
@@ -242,3 +249,72 @@ class Test05ReviewAPI:
             f'Check that the DELETE request `/api/v1/titles/{{title_id}}/reviews/{{review_id}}/` ' \
             f'without token returns401'
         self.check_permissions(user, 'user', reviews, titles)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_rating_after_author_deleted(self, user_client, admin):
+        reviews, titles, user, moderator = create_reviews(user_client, admin)
+        response = user_client.delete(f'/api/v1/users/{user.username}/')
+        assert response.status_code == 204, \
+            'Check that the DELETE request `/api/v1/users/{username}/` returns 204'
+        response = user_client.get(f'/api/v1/titles/{titles[0]["id"]}/')
+        assert response.json().get('rating') == 4, \
+            'Check that deleting an author recalculates `rating` of titles they reviewed'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_06_rebuild_title_ratings(self, user_client, admin):
+        reviews, titles, user, moderator = create_reviews(user_client, admin)
+        Title.objects.update(rating_sum=0, rating_count=0)
+        call_command('rebuild_title_ratings', stdout=StringIO())
+        title = Title.objects.get(pk=titles[0]['id'])
+        assert (title.rating_sum, title.rating_count) == (12, 3), \
+            'Check that `rebuild_title_ratings` recalculates rating counters from reviews'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_07_rating_of_orm_reviews(self, user_client, admin):
+        reviews, titles, user, moderator = create_reviews(user_client, admin)
+        Review.objects.create(title_id=titles[1]['id'], author=moderator, text='orm', score=6)
+        title = Title.objects.get(pk=titles[1]['id'])
+        assert title.rating_count == 1 and title.rating_sum == 6, \
+            'Check that reviews created through the ORM update rating counters of their title'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_08_rating_never_negative(self, user_client, admin):
+        reviews, titles, user, moderator = create_reviews(user_client, admin)
+        review = Review.objects.create(title_id=titles[1]['id'], author=moderator, text='orm', score=6)
+        Title.objects.update(rating_sum=0, rating_count=0)
+        review.delete()
+        title = Title.objects.get(pk=titles[1]['id'])
+        assert (title.rating_sum, title.rating_count) == (0, 0), \
+            'Check that rating counters never drop below zero'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_09_reviews_cursor_pagination(self, client, user_client, admin):
+        reviews, titles, user, moderator = create_reviews(user_client, admin)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/?pagination=cursor&limit=1'
+        seen = []
+        while url:
+            response = client.get(url)
+            assert response.status_code == 200, \
+                'Check that the GET request `/api/v1/titles/{title_id}/reviews/?pagination=cursor` returns 200'
+            data = response.json()
+            assert 'count' not in data, \
+                'Check that cursor pagination of `/api/v1/titles/{title_id}/reviews/` does not return `count`'
+            seen.extend(review['id'] for review in data['results'])
+            url = data['next']
+        assert seen == [review['id'] for review in reviews], \
+            'Check that cursor pagination of `/api/v1/titles/{title_id}/reviews/` ' \
+            'returns every review once ordered by `pub_date`'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_10_review_of_deleted_title(self, user_client, monkeypatch):
+        titles, _, _ = create_titles(user_client)
+
+        def delete_title(request):
+            # The title is deleted between its lookup and the insert.
+            Title.objects.filter(pk=titles[0]['id']).delete()
+            return get_request_user(request)
+
+        monkeypatch.setattr(views, 'get_request_user', delete_title)
+        response = user_client.post(f'/api/v1/titles/{titles[0]["id"]}/reviews/', data={'text': 'Late', 'score': 5})
+        assert response.status_code == 404, \
+            'Check that a review of a title deleted meanwhile returns 404, not the duplicate review error'
@@ -1,8 +1,17 @@
+from io import StringIO
+
 import pytest
+from django.core.management import call_command
+
+from api.models import Comment, Review
 
 from .common import auth_client, create_reviews, create_comments
 
 
+def comments_count(client, titles, reviews):
+    return client.get(f'/api/v1/titles/{titles[0]["id"]}/reviews/{reviews[0]["id"]}/').json().get('comments_count')
+
+
 class Test06CommentAPI:
 
     @pytest.mark.django_db(transaction=True)
@@ -201,3 +210,85 @@ class Test06CommentAPI:
             f'Check that the DELETE request `/api/v1/titles/{{title_id}}/reviews/{{review_id}}/comments/{{comment_id}}/` ' \
             f'without token returns 401'
         self.check_permissions(user, 'user', f'{pre_url}{comments[2]["id"]}/')
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_comments_count(self, client, user_client, admin):
+        comments, reviews, titles, user, moderator = create_comments(user_client, admin)
+        response = client.get(f'/api/v1/titles/{titles[0]["id"]}/reviews/')
+        listed = {review['id']: review.get('comments_count') for review in response.json()['results']}
+        assert listed[reviews[0]['id']] == len(comments) and comments_count(client, titles, reviews) == len(comments), \
+            'Check that reviews return the number of their comments in `comments_count`'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_06_reviews_count(self, client, user_client, admin):
+        comments, reviews, titles, user, moderator = create_comments(user_client, admin)
+        count = client.get(f'/api/v1/titles/{titles[0]["id"]}/reviews/').json()['count']
+        title = client.get(f'/api/v1/titles/{titles[0]["id"]}/').json()
+        assert title.get('reviews_count') == count, \
+            'Check that titles return the number of their reviews in `reviews_count`'
+        listed = {title['id']: title.get('reviews_count') for title in client.get('/api/v1/titles/').json()['results']}
+        assert listed[titles[0]['id']] == count, \
+            'Check that title lists return the number of reviews of every title in `reviews_count`'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_07_comments_count_on_create(self, client, user_client, admin):
+        comments, reviews, titles, user, moderator = create_comments(user_client, admin)
+        reviews_url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        etag = client.get(reviews_url)['ETag']
+        user_client.post(f'{reviews_url}{reviews[0]["id"]}/comments/', data={'text': 'One more'})
+        assert comments_count(client, titles, reviews) == len(comments) + 1, \
+            'Check that creating a comment increments `comments_count` of its review'
+        assert client.get(reviews_url, HTTP_IF_NONE_MATCH=etag).status_code == 200, \
+            'Check that creating a comment changes the `ETag` of the review list'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_08_comments_count_on_review_edit(self, client, user_client, admin):
+        comments, reviews, titles, user, moderator = create_comments(user_client, admin)
+        user_client.patch(f'/api/v1/titles/{titles[0]["id"]}/reviews/{reviews[0]["id"]}/', data={'text': 'Edited'})
+        assert comments_count(client, titles, reviews) == len(comments), \
+            'Check that editing a review keeps its `comments_count`'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_09_comments_count_on_delete(self, client, user_client, admin):
+        comments, reviews, titles, user, moderator = create_comments(user_client, admin)
+        pre_url = f'/api/v1/titles/{titles[0]["id"]}/reviews/{reviews[0]["id"]}/comments/'
+        auth_client(moderator).delete(f'{pre_url}{comments[0]["id"]}/')
+        assert comments_count(client, titles, reviews) == len(comments) - 1, \
+            'Check that deleting a comment decrements `comments_count` of its review'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_10_comments_count_on_author_delete(self, client, user_client, admin):
+        comments, reviews, titles, user, moderator = create_comments(user_client, admin)
+        user_client.delete(f'/api/v1/users/{moderator.username}/')
+        assert comments_count(client, titles, reviews) == len(comments) - 1, \
+            'Check that deleting an author decrements `comments_count` of the reviews they commented'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_11_rebuild_comment_counts(self, client, user_client, admin):
+        comments, reviews, titles, user, moderator = create_comments(user_client, admin)
+        Review.objects.update(comments_count=0)
+        call_command('rebuild_comment_counts', stdout=StringIO())
+        assert comments_count(client, titles, reviews) == len(comments), \
+            'Check that `rebuild_comment_counts` recalculates comment counters from comments'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_12_comments_count_of_orm_comments(self, client, user_client, admin):
+        comments, reviews, titles, user, moderator = create_comments(user_client, admin)
+        for i in range(10):
+            Comment.objects.create(review_id=reviews[0]['id'], author=admin, text=f'orm {i}')
+        assert comments_count(client, titles, reviews) == len(comments) + 10, \
+            'Check that comments created through the ORM increment `comments_count` of their review'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_13_title_delete_cascade(self, user_client, admin, django_assert_max_num_queries):
+        comments, reviews, titles, user, moderator = create_comments(user_client, admin)
+        for review in Review.objects.filter(title_id=titles[0]['id']):
+            for i in range(10):
+                Comment.objects.create(review=review, author=admin, text=f'orm {i}')
+        with django_assert_max_num_queries(20):
+            response = user_client.delete(f'/api/v1/titles/{titles[0]["id"]}/')
+        assert response.status_code == 204, \
+            'Check that deleting a title deletes its reviews and comments without a query per comment'
+        assert not Comment.objects.filter(review__title_id=titles[0]['id']).exists() \
+            and not Review.objects.filter(title_id=titles[0]['id']).exists(), \
+            'Check that deleting a title deletes its reviews and their comments'
@@ -0,0 +1,256 @@
+import logging
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.authentication import ClaimsJWTAuthentication, ClaimsRefreshToken, ClaimsUser
+from api.mailqueue import process_batch
+from api.management.commands import process_mail_queue
+from api.models import ConfirmationCode, MailJob, User
+
+from .common import claims_client, create_comments, create_titles, create_users_api
+
+
+def request_code(client, email):
+    client.post('/api/v1/auth/email/', data={'email': email})
+    call_command('process_mail_queue', '--once', stdout=StringIO())
+    return mail.outbox[-1].body.split()[-1]
+
+
+def request_token(client, user):
+    code = request_code(client, user.email)
+    return client.post('/api/v1/auth/token/', data={'email': user.email, 'confirmation_code': code})
+
+
+def break_sending(monkeypatch):
+    def broken_send(self, fail_silently=False):
+        raise ConnectionError('Mail server is down')
+
+    monkeypatch.setattr(mail.EmailMessage, 'send', broken_send)
+
+
+@pytest.fixture
+def token_user(client, user_client, shared_cache):
+    """A user, and a client with the token /auth/token/ issued to it."""
+    user, _ = create_users_api(user_client)
+    token_client = APIClient()
+    token_client.credentials(HTTP_AUTHORIZATION=f'Bearer {request_token(client, user).json()["access"]}')
+    return token_client, user
+
+
+class Test07AuthAPI:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_email_queued(self, client, admin):
+        response = client.post('/api/v1/auth/email/', data={'email': admin.email})
+        assert response.status_code == 200, \
+            'Check that the POST request `/api/v1/auth/email/` returns 200'
+        assert len(mail.outbox) == 0, \
+            'Check that the POST request `/api/v1/auth/email/` only enqueues the email'
+        assert MailJob.objects.filter(to_email=admin.email, status=MailJob.Status.PENDING).exists(), \
+            'Check that the POST request `/api/v1/auth/email/` enqueues the email'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_email_sent(self, client, admin):
+        client.post('/api/v1/auth/email/', data={'email': admin.email})
+        stdout = StringIO()
+        call_command('process_mail_queue', '--once', stdout=stdout)
+        assert len(mail.outbox) == 1 and mail.outbox[0].to == [admin.email], \
+            'Check that `process_mail_queue` sends the queued email'
+        assert stdout.getvalue() == 'Sent 1 emails, 0 failed\n', \
+            'Check that `process_mail_queue` reports the emails it sent'
+        code = mail.outbox[0].body.split()[-1]
+        response = client.post('/api/v1/auth/token/', data={'email': admin.email, 'confirmation_code': code})
+        assert response.status_code == 200, \
+            'Check that the sent email contains the confirmation code'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_sent_email_body_cleared(self, client, admin):
+        code = request_code(client, admin.email)
+        job = MailJob.objects.get(to_email=admin.email)
+        assert job.status == MailJob.Status.SENT and code not in job.body, \
+            'Check that sent emails do not keep the confirmation code'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_email_retried(self, client, admin, monkeypatch):
+        client.post('/api/v1/auth/email/', data={'email': admin.email})
+        break_sending(monkeypatch)
+        assert process_batch() == (0, 1)
+        job = MailJob.objects.get(to_email=admin.email)
+        assert job.status == MailJob.Status.PENDING and job.attempts == 1, \
+            'Check that a failed email stays queued for a retry'
+        assert process_batch() == (0, 0), \
+            'Check that a failed email is retried only after a backoff delay'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_email_given_up(self, client, admin, settings, monkeypatch):
+        settings.MAIL_QUEUE_MAX_ATTEMPTS = 2
+        client.post('/api/v1/auth/email/', data={'email': admin.email})
+        break_sending(monkeypatch)
+        process_batch()
+        MailJob.objects.update(run_at=timezone.now())
+        assert process_batch() == (0, 1)
+        job = MailJob.objects.get(to_email=admin.email)
+        assert job.status == MailJob.Status.FAILED and 'Mail server is down' in job.last_error, \
+            'Check that an email is given up after `MAIL_QUEUE_MAX_ATTEMPTS` attempts'
+        assert job.body == '', \
+            'Check that given up emails do not keep the confirmation code'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_06_mail_connection_failure(self, client, admin, monkeypatch):
+        def broken_open(self):
+            raise ConnectionRefusedError('Mail server is unreachable')
+
+        monkeypatch.setattr(EmailBackend, 'open', broken_open, raising=False)
+        client.post('/api/v1/auth/email/', data={'email': admin.email})
+        assert process_batch() == (0, 1)
+        job = MailJob.objects.get(to_email=admin.email)
+        assert job.status == MailJob.Status.PENDING and job.attempts == 1 and job.run_at > timezone.now() \
+            and 'unreachable' in job.last_error, \
+            'Check that a batch whose mail connection fails is rescheduled with a backoff delay'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_07_mail_queue_batch_error(self, caplog, monkeypatch):
+        def broken_batch(batch_size=None):
+            raise ConnectionError('Database is down')
+
+        monkeypatch.setattr(process_mail_queue, 'process_batch', broken_batch)
+        with caplog.at_level(logging.ERROR, logger=process_mail_queue.__name__):
+            call_command('process_mail_queue', '--once', stdout=StringIO())
+        assert [record.getMessage() for record in caplog.records] == ['Processing a mail batch failed'] \
+            and 'Database is down' in caplog.text, \
+            'Check that `process_mail_queue` logs a failing batch instead of crashing'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_08_token(self, client, user_client):
+        user, _ = create_users_api(user_client)
+        response = request_token(client, user)
+        assert response.status_code == 200 and 'access' in response.json(), \
+            'Check that the POST request `/api/v1/auth/token/` returns a token'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_09_token_claims_queries(self, user_client, token_user, django_assert_num_queries):
+        token_client, _ = token_user
+        create_titles(user_client)
+        token_client.get('/api/v1/titles/?limit=2')
+        # page of titles joined with categories, prefetched genres
+        with django_assert_num_queries(2):
+            token_client.get('/api/v1/titles/?limit=1')
+
+    @pytest.mark.django_db(transaction=True)
+    def test_10_token_claims_write(self, user_client, token_user):
+        token_client, user = token_user
+        titles, _, _ = create_titles(user_client)
+        response = token_client.post(f'/api/v1/titles/{titles[0]["id"]}/reviews/',
+                                     data={'text': 'Fine', 'score': 8})
+        assert response.status_code == 201 and response.json()['author'] == user.username, \
+            'Check that a token authenticated by its claims can create a review'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_11_token_claims_role_change(self, user_client, token_user):
+        token_client, user = token_user
+        titles, _, _ = create_titles(user_client)
+        review_url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        review = user_client.post(review_url, data={'text': 'Fine', 'score': 8}).json()
+        assert token_client.delete(f'{review_url}{review["id"]}/').status_code == 403
+        user_client.patch(f'/api/v1/users/{user.username}/', data={'role': 'moderator'})
+        assert token_client.delete(f'{review_url}{review["id"]}/').status_code == 204, \
+            'Check that a role change applies to tokens issued before it'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_12_token_claims_deactivated_user(self, token_user):
+        token_client, user = token_user
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+        assert token_client.get('/api/v1/titles/').status_code == 401, \
+            'Check that tokens of a deactivated user are rejected'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_13_token_claims_deleted_user(self, token_user):
+        token_client, user = token_user
+        user.delete()
+        assert token_client.get('/api/v1/titles/').status_code == 401, \
+            'Check that tokens of a deleted user are rejected'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_14_token_claims_cache(self, admin, settings, shared_cache):
+        token = ClaimsRefreshToken.for_user(admin).access_token
+        assert isinstance(ClaimsJWTAuthentication().get_user(token), ClaimsUser), \
+            'Check that claims are trusted with a shared cache'
+        settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        assert not isinstance(ClaimsJWTAuthentication().get_user(token), ClaimsUser), \
+            'Check that claims are checked against the database with a process-local cache'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_15_token_claims_owner(self, user_client, admin, shared_cache):
+        comments, reviews, titles, user, moderator = create_comments(user_client, admin)
+        owner = claims_client(user)
+        review_url = f'/api/v1/titles/{titles[0]["id"]}/reviews/{reviews[1]["id"]}/'
+        comment_url = f'/api/v1/titles/{titles[0]["id"]}/reviews/{reviews[0]["id"]}/comments/{comments[1]["id"]}/'
+        assert owner.patch(review_url, data={'text': 'Edited'}).status_code == 200, \
+            'Check that a token authenticated by its claims can edit its own review'
+        assert owner.patch(comment_url, data={'text': 'Edited'}).status_code == 200, \
+            'Check that a token authenticated by its claims can edit its own comment'
+        review_url = f'/api/v1/titles/{titles[0]["id"]}/reviews/{reviews[0]["id"]}/'
+        assert owner.patch(review_url, data={'text': 'Mine'}).status_code == 403, \
+            'Check that a token authenticated by its claims can not edit reviews of others'
+        assert claims_client(moderator).delete(comment_url).status_code == 204, \
+            'Check that a moderator token authenticated by its claims can delete comments of others'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_16_claims_changed_at(self, admin):
+        user = User.objects.create(username='reader', email='reader@yamdb.fake')
+        changed_at = User.objects.get(pk=user.pk).claims_changed_at
+        claims_client(user).patch('/api/v1/users/me/', data={'bio': 'Reads a lot'})
+        user = User.objects.get(pk=user.pk)
+        assert (user.bio, user.claims_changed_at) == ('Reads a lot', changed_at), \
+            'Check that editing fields tokens do not carry keeps the tokens of a user valid'
+        user.first_name = 'Ann'
+        user.save()
+        assert User.objects.get(pk=user.pk).claims_changed_at == changed_at, \
+            'Check that saving a user without changing its claims keeps its tokens valid'
+        user.role = User.Role.MODERATOR
+        user.save()
+        assert User.objects.get(pk=user.pk).claims_changed_at > changed_at, \
+            'Check that changing the role of a user makes its tokens be checked again'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_17_confirmation_code_hashed(self, client, admin):
+        code = request_code(client, admin.email)
+        assert not ConfirmationCode.objects.filter(code_hash=code).exists(), \
+            'Check that confirmation codes are stored hashed'
+        data = {'email': admin.email, 'confirmation_code': code}
+        assert client.post('/api/v1/auth/token/', data=data).status_code == 200
+        assert client.post('/api/v1/auth/token/', data=data).status_code == 404, \
+            'Check that a confirmation code can be used once'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_18_confirmation_code_expiry(self, client, admin):
+        ConfirmationCode.issue(admin.email, 'expired-code')
+        ConfirmationCode.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        data = {'email': admin.email, 'confirmation_code': 'expired-code'}
+        assert client.post('/api/v1/auth/token/', data=data).status_code == 404, \
+            'Check that an expired confirmation code is rejected'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_19_purge_confirmation_codes(self, admin):
+        ConfirmationCode.issue(admin.email, 'expired-code')
+        ConfirmationCode.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        ConfirmationCode.issue(admin.email, 'valid-code')
+        MailJob.objects.create(to_email=admin.email, subject='Code', body='old-code', status=MailJob.Status.SENT)
+        MailJob.objects.create(to_email=admin.email, subject='Code', body='new-code')
+        stdout = StringIO()
+        call_command('purge_confirmation_codes', stdout=stdout)
+        assert list(ConfirmationCode.objects.values_list('code_hash', flat=True)) \
+            == [ConfirmationCode.hash_code('valid-code')], \
+            'Check that `purge_confirmation_codes` deletes only expired codes'
+        assert list(MailJob.objects.exclude(body='').values_list('body', flat=True)) == ['new-code'], \
+            'Check that `purge_confirmation_codes` clears the bodies of sent emails only'
+        assert 'Deleted 1 expired confirmation codes, cleared 1 email bodies' in stdout.getvalue(), \
+            'Check that `purge_confirmation_codes` reports what it deleted'
@@ -0,0 +1,234 @@
+import json
+import os
+from io import StringIO
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from prometheus_client.parser import text_string_to_metric_families
+
+from api.cache import cache_is_shared
+from api.models import ConfirmationCode, MailJob, Title
+from api.slowlog import explain
+from benchmarks.harness import compare, isolated, percentile
+from benchmarks.routes import BENCHMARK_USERNAME
+
+from .common import create_reviews, create_titles
+
+
+def get_samples(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200, \
+        'Check that the GET request `/metrics` returns 200'
+    return {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for family in text_string_to_metric_families(response.content.decode())
+        for sample in family.samples
+    }
+
+
+def get_sample(samples, name, **labels):
+    return samples.get((name, tuple(sorted(labels.items()))), 0)
+
+
+def sample_delta(before, after, name, **labels):
+    return get_sample(after, name, **labels) - get_sample(before, name, **labels)
+
+
+def read_slow_log(settings):
+    with open(settings.SLOW_QUERY_LOG) as log:
+        return [json.loads(line) for line in log]
+
+
+def like_scans(records):
+    return [record for record in records if 'LIKE' in record['sql'] and 'COUNT' not in record['sql']]
+
+
+def log_every_query(settings, tmp_path):
+    settings.SLOW_QUERY_LOG = str(tmp_path / 'slow.jsonl')
+    settings.SLOW_QUERY_THRESHOLD_MS = 0
+
+
+@pytest.fixture
+def benchmark_data(user_client, admin):
+    """Reviewed titles for the benchmarks, and a cache holding only a sentinel."""
+    create_reviews(user_client, admin)
+    cache.clear()
+    cache.set('sentinel', 1)
+
+
+class Test08MetricsAPI:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_metrics_requests(self, client, user_client):
+        create_titles(user_client)
+        before = get_samples(client)
+        client.get('/api/v1/genres/')
+        client.get('/api/v1/genres/')
+        client.get('/api/v1/titles/')
+        after = get_samples(client)
+        assert sample_delta(before, after, 'api_requests_total', view='GenreViewSet.list', method='GET',
+                            status='200') == 2, \
+            'Check that `/metrics` counts requests by viewset and action'
+        assert sample_delta(before, after, 'api_request_duration_seconds_count', view='TitleViewSet.list') == 1, \
+            'Check that `/metrics` reports a latency histogram by viewset and action'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_metrics_queries(self, client, user_client):
+        create_titles(user_client)
+        before = get_samples(client)
+        client.get('/api/v1/titles/')
+        after = get_samples(client)
+        assert sample_delta(before, after, 'api_request_queries_sum', view='TitleViewSet.list') == 3, \
+            'Check that `/metrics` reports a database query histogram by viewset and action'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_metrics_cache(self, client, user_client):
+        create_titles(user_client)
+        before = get_samples(client)
+        client.get('/api/v1/genres/')
+        client.get('/api/v1/genres/')
+        after = get_samples(client)
+        assert sample_delta(before, after, 'api_cache_requests_total', cache='list', resource='genres',
+                            result='hit') == 1, \
+            'Check that `/metrics` counts cache hits'
+        assert 0 < get_sample(after, 'api_cache_hit_ratio', cache='list', resource='genres') < 1, \
+            'Check that `/metrics` reports cache hit ratios'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_slow_queries(self, client, user_client, settings, tmp_path):
+        create_titles(user_client)
+        log_every_query(settings, tmp_path)
+        client.get('/api/v1/titles/?name=Turn')
+        client.get('/api/v1/titles/?name=Proj')
+        records = read_slow_log(settings)
+        assert records and all(record['view'] == 'TitleViewSet.list' for record in records), \
+            'Check that slow queries are logged with their originating view'
+        scans = like_scans(records)
+        assert len(scans) == 2 and len({record['fingerprint'] for record in scans}) == 1, \
+            'Check that slow queries differing only in parameters share a fingerprint'
+        assert scans[0]['plan'], \
+            'Check that slow queries are logged with their plan'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_slow_queries_command(self, client, user_client, settings, tmp_path):
+        create_titles(user_client)
+        log_every_query(settings, tmp_path)
+        client.get('/api/v1/titles/?name=Turn')
+        client.get('/api/v1/titles/?name=Proj')
+        fingerprint = like_scans(read_slow_log(settings))[0]['fingerprint']
+        out = StringIO()
+        call_command('slow_queries', stdout=out)
+        assert fingerprint in out.getvalue() and 'count 2' in out.getvalue(), \
+            'Check that `slow_queries` summarizes the slow query log'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_06_slow_query_log_rotation(self, client, user_client, settings, tmp_path):
+        create_titles(user_client)
+        log_every_query(settings, tmp_path)
+        client.get('/api/v1/titles/?name=Turn')
+        os.rename(settings.SLOW_QUERY_LOG, settings.SLOW_QUERY_LOG + '.1')
+        client.get('/api/v1/titles/?name=Proj')
+        assert os.path.exists(settings.SLOW_QUERY_LOG), \
+            'Check that the slow query log is reopened after it was rotated'
+        out = StringIO()
+        call_command('slow_queries', stdout=out)
+        assert 'count 2' in out.getvalue(), \
+            'Check that `slow_queries` reads rotated files as well'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_07_explain_failure(self, user_client):
+        create_titles(user_client)
+        with transaction.atomic():
+            plan = explain(connection, 'SELECT * FROM missing_table', ())
+            assert plan and plan[0].startswith('EXPLAIN failed'), \
+                'Check that a failed EXPLAIN is recorded in the plan'
+            assert Title.objects.count() == 2, \
+                'Check that a failed EXPLAIN leaves the transaction of the request usable'
+
+    def test_08_benchmark_percentile(self):
+        values = list(range(1, 101))
+        assert (percentile(values, 50), percentile(values, 95), percentile(values, 99)) == (50, 95, 99), \
+            'Check that `percentile` uses the nearest rank'
+        assert percentile([7], 95) == 7 and percentile([3, 1, 2], 0) == 1, \
+            'Check that `percentile` handles single values and the lowest rank'
+
+    def test_09_benchmark_compare(self):
+        baseline = {'titles.list': {'p50_ms': 10.0, 'p95_ms': 20.0, 'peak_kb': 100.0, 'queries': 2}}
+        within = {'titles.list': {'p50_ms': 12.5, 'p95_ms': 25.0, 'peak_kb': 125.0, 'queries': 2},
+                  'new.route': {'p50_ms': 1000.0, 'p95_ms': 1000.0, 'peak_kb': 1000.0, 'queries': 100}}
+        assert compare(within, baseline, 0.25) == [], \
+            'Check that metrics within the threshold, and routes without a baseline, pass'
+        slower = {'titles.list': {'p50_ms': 12.6, 'p95_ms': 20.0, 'peak_kb': 100.0, 'queries': 2}}
+        regressions = compare(slower, baseline, 0.25)
+        assert len(regressions) == 1 and regressions[0].startswith('titles.list: p50_ms'), \
+            'Check that metrics beyond the threshold are regressions'
+        assert compare(slower, baseline, 0.5) == [], \
+            'Check that the threshold is relative to the baseline'
+        more_queries = {'titles.list': {'p50_ms': 5.0, 'p95_ms': 5.0, 'peak_kb': 50.0, 'queries': 3}}
+        assert compare(more_queries, baseline, 10) == ['titles.list: queries 2 -> 3'], \
+            'Check that any additional query is a regression, whatever the threshold'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_10_benchmark_isolated(self, benchmark_data, tmp_path, django_user_model):
+        users, mails, codes = django_user_model.objects.count(), MailJob.objects.count(), \
+            ConfirmationCode.objects.count()
+        call_command('benchmark', 'genres.list', 'auth', iterations=2, warmup=0, update=True,
+                     baseline=str(tmp_path / 'baseline.json'), stdout=StringIO())
+        assert not django_user_model.objects.filter(username=BENCHMARK_USERNAME).exists() \
+            and django_user_model.objects.count() == users, \
+            'Check that `benchmark` leaves no benchmark user behind'
+        assert (MailJob.objects.count(), ConfirmationCode.objects.count()) == (mails, codes), \
+            'Check that `benchmark` rolls back the mails and codes its routes create'
+        assert cache.get('sentinel') == 1 and cache.get('api:genres:version') is None, \
+            'Check that `benchmark` fills a cache of its own'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_11_benchmark_shared_cache(self):
+        with isolated():
+            assert cache_is_shared(), \
+                'Check that benchmarks run with a shared cache, so token claims are trusted'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_12_benchmark_regression(self, benchmark_data, tmp_path):
+        baseline = str(tmp_path / 'baseline.json')
+        options = {'iterations': 2, 'warmup': 0, 'baseline': baseline, 'stdout': StringIO()}
+        call_command('benchmark', 'auth.email', update=True, **options)
+        with open(baseline) as source:
+            stored = json.load(source)
+        assert set(stored['routes']) == {'auth.email'}, \
+            'Check that `benchmark --update` stores the results of the routes it ran'
+        stored['routes']['auth.email']['queries'] = 0
+        with open(baseline, 'w') as target:
+            json.dump(stored, target)
+        with pytest.raises(CommandError, match='auth.email: queries 0'):
+            call_command('benchmark', 'auth.email', **options)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_13_benchmark_compression_isolated(self, benchmark_data, django_user_model):
+        users = django_user_model.objects.count()
+        out = StringIO()
+        call_command('benchmark_compression', '--routes', 'reviews.list', '--iterations', '1', stdout=out)
+        assert 'reviews.list' in out.getvalue(), \
+            'Check that `benchmark_compression` reports the routes it ran'
+        assert not django_user_model.objects.filter(username=BENCHMARK_USERNAME).exists() \
+            and django_user_model.objects.count() == users, \
+            'Check that `benchmark_compression` leaves no benchmark user behind'
+        assert cache.get('sentinel') == 1 and cache.get('api:authors:version') is None, \
+            'Check that `benchmark_compression` fills a cache of its own'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_14_benchmark_concurrency_isolated(self, benchmark_data, django_user_model):
+        users = django_user_model.objects.count()
+        out = StringIO()
+        call_command('benchmark_concurrency', '--concurrency', '1', '2', '--requests', '4',
+                     '--query-latency', '0', stdout=out)
+        assert len(out.getvalue().splitlines()) == 3, \
+            'Check that `benchmark_concurrency` reports every concurrency level'
+        assert not django_user_model.objects.filter(username=BENCHMARK_USERNAME).exists() \
+            and django_user_model.objects.count() == users, \
+            'Check that `benchmark_concurrency` leaves no benchmark user behind'
+        assert cache.get('sentinel') == 1 and cache.get('api:titles:version') is None, \
+            'Check that `benchmark_concurrency` fills a cache of its own'
@@ -0,0 +1,379 @@
+import asyncio
+import datetime
+import decimal
+import gzip
+import io
+import runpy
+import threading
+import uuid
+import zlib
+from types import SimpleNamespace
+
+import pytest
+from django.core.cache import cache
+from django.db import DatabaseError, connection, connections
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from api import edgecache, health
+from api.cache import cache_key
+from api.checks import check_shared_cache
+from api.compression import CODECS, compress_stream, negotiate
+from api.renderers import FastJSONRenderer
+from api_yamdb.handlers import ReadPoolASGIHandler
+from benchmarks.concurrency import build_scope, run_clients
+
+from .common import create_titles
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def create_replicated_titles(user_client, admin, replica, django_user_model):
+    """Titles on the primary only, the replica knows just their author."""
+    django_user_model.objects.using(replica).bulk_create([admin])
+    titles, categories, genres = create_titles(user_client)
+    return titles
+
+
+def purge_requests(monkeypatch):
+    purged = []
+
+    def urlopen(request, timeout):
+        purged.append((request.method, request.full_url))
+        return io.BytesIO()
+
+    monkeypatch.setattr(edgecache.urllib.request, 'urlopen', urlopen)
+    return purged
+
+
+def gunicorn_server(errors):
+    return SimpleNamespace(cfg=SimpleNamespace(workers=2),
+                           log=SimpleNamespace(error=lambda *args: errors.append(args)))
+
+
+class Test09Serving:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_asgi_read_pool(self, user_client):
+        create_titles(user_client)
+        threads = set()
+
+        def record_thread(sender, connection, **kwargs):
+            threads.add(threading.current_thread().name)
+
+        application = ReadPoolASGIHandler()
+        scopes = [build_scope('/api/v1/titles/', []) for _ in range(8)]
+        connection_created.connect(record_thread)
+        try:
+            timings, _ = asyncio.run(run_clients(application, scopes, 4))
+        finally:
+            connection_created.disconnect(record_thread)
+        assert len(timings) == 8, \
+            'Check that the ASGI application answers concurrent read requests'
+        assert threads and all(name.startswith('asgi-read') for name in threads), \
+            'Check that read requests are served from the ASGI read pool'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_health(self, client):
+        response = client.get('/health/live')
+        assert response.status_code == 200, \
+            'Check that the GET request `/health/live` returns 200'
+        response = client.get('/health/ready')
+        assert response.status_code == 200 and response.json() == {'database': 'ok', 'cache': 'ok'}, \
+            'Check that the GET request `/health/ready` returns 200 with the result of every check'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_health_failing(self, client, monkeypatch):
+        def fail():
+            raise DatabaseError('connection refused')
+
+        monkeypatch.setitem(health.CHECKS, 'database', fail)
+        response = client.get('/health/ready')
+        assert response.status_code == 503 and response.json()['database'] != 'ok', \
+            'Check that the GET request `/health/ready` returns 503 when a check fails'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_persistent_connection_health_check(self, client, settings, monkeypatch):
+        settings.CONN_HEALTH_CHECKS = True
+        settings.CONN_HEALTH_CHECK_INTERVAL = 60
+        client.get('/api/v1/titles/')
+        assert connection.connection is not None, \
+            'Check that database connections are kept between requests'
+        checks = []
+        monkeypatch.setattr(connection, 'health_checked_at', None, raising=False)
+        monkeypatch.setattr(connection, 'is_usable', lambda: checks.append(True) or False)
+        closed = []
+        monkeypatch.setattr(connection, 'close', lambda: closed.append(True))
+        client.get('/api/v1/titles/')
+        assert closed, \
+            'Check that a dropped persistent connection is closed before it is used'
+        client.get('/api/v1/titles/')
+        assert len(checks) == 1, \
+            'Check that a connection is pinged at most every `CONN_HEALTH_CHECK_INTERVAL` seconds'
+
+    def test_05_replica_reads(self, client, user_client, admin, replica, django_user_model):
+        titles = create_replicated_titles(user_client, admin, replica, django_user_model)
+        assert len(titles) == 2, \
+            'Check that reads after a write in the same request use the primary'
+        response = client.get('/api/v1/titles/')
+        assert response.json()['count'] == 2, \
+            'Check that resources changed within `DATABASE_REPLICA_LAG` are read from the primary'
+        cache.delete(cache_key('titles', 'changed'))
+        response = client.get('/api/v1/titles/?limit=5')
+        assert response.json()['count'] == 0, \
+            'Check that GET requests of the API read from the replicas'
+
+    def test_06_replica_reads_after_write(self, user_client, admin, replica, django_user_model):
+        titles = create_replicated_titles(user_client, admin, replica, django_user_model)
+        cache.delete(cache_key('titles', 'changed'))
+        response = user_client.get('/api/v1/titles/?limit=5')
+        assert response.json()['count'] == 2, \
+            'Check that a client keeps reading from the primary after it wrote'
+        response = user_client.post(f'/api/v1/titles/{titles[0]["id"]}/reviews/', data={'text': 'Fine', 'score': 8})
+        assert response.status_code == 201, \
+            'Check that writes go to the primary'
+
+    def test_07_unreachable_replica(self, client, user_client, admin, replica, settings, tmp_path,
+                                    django_user_model):
+        create_replicated_titles(user_client, admin, replica, django_user_model)
+        settings.DATABASE_REPLICA_CHECK_INTERVAL = 0
+        cache.delete(cache_key('titles', 'changed'))
+        name = connections[replica].settings_dict['NAME']
+        connections[replica].close()
+        connections[replica].settings_dict['NAME'] = str(tmp_path / 'missing' / 'replica.sqlite3')
+        response = client.get('/api/v1/titles/?limit=6')
+        assert response.json()['count'] == 2, \
+            'Check that unreachable replicas are left out of the routing'
+        response = client.get('/health/ready')
+        assert response.status_code == 200, \
+            'Check that `/health/ready` does not depend on the replicas'
+        connections[replica].settings_dict['NAME'] = name
+        response = client.get('/api/v1/titles/?limit=7')
+        assert response.json()['count'] == 0, \
+            'Check that replicas return to the routing once they answer again'
+
+    def test_08_replica_lag(self, user_client, admin, replica, settings, django_user_model):
+        titles = create_replicated_titles(user_client, admin, replica, django_user_model)
+        settings.DATABASE_REPLICA_LAG = 0
+        user_client.patch(f'/api/v1/titles/{titles[0]["id"]}/', data={'name': 'Renamed'})
+        response = user_client.get('/api/v1/titles/')
+        assert response.json()['count'] == 0, \
+            'Check that clients read from the replicas again once the lag tolerance passed'
+
+    def test_09_fast_json_renderer(self):
+        data = {
+            'pub_date': datetime.datetime(2020, 5, 1, 12, 30, 15, 1234, tzinfo=datetime.timezone.utc),
+            'naive': datetime.datetime(2020, 5, 1, 12, 30),
+            'day': datetime.date(2020, 5, 1),
+            'rating': decimal.Decimal('7.25'),
+            'score': 7.5,
+            'id': uuid.UUID(int=1),
+            'text': 'Ünïcode \u2028 line',
+            'results': [{'a': None, 'b': True}],
+        }
+        assert FastJSONRenderer().render(data) == JSONRenderer().render(data), \
+            'Check that `FastJSONRenderer` renders the same bytes as `JSONRenderer`'
+
+    def test_10_fast_json_renderer_big_integers(self):
+        data = {'id': 2 ** 70, 'ids': [-2 ** 64]}
+        assert FastJSONRenderer().render(data) == JSONRenderer().render(data), \
+            'Check that `FastJSONRenderer` renders integers beyond 64 bits like `JSONRenderer`'
+
+    @pytest.mark.parametrize('value', [float('nan'), float('inf')])
+    def test_11_fast_json_renderer_non_finite(self, value):
+        with pytest.raises(ValueError):
+            FastJSONRenderer().render({'results': [{'rating': None, 'score': value}]})
+
+    @pytest.mark.django_db(transaction=True)
+    def test_12_asgi_streaming(self, client, user_client, settings):
+        create_titles(user_client)
+        expected = client.get('/api/v1/titles/').content
+        settings.API_STREAMING_MIN_PAGE_SIZE = 1
+        settings.API_STREAMING_CHUNK_SIZE = 1
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        application = ReadPoolASGIHandler()
+        asyncio.run(application(build_scope('/api/v1/titles/', []), receive, send))
+        body = b''.join(message.get('body', b'') for message in messages[1:])
+        assert messages[0]['status'] == 200 and len(messages) > 3, \
+            'Check that the ASGI application streams large pages'
+        assert body == expected, \
+            'Check that pages streamed over ASGI are the same as regular ones'
+
+    def test_13_compression_negotiation(self):
+        factory = RequestFactory()
+        request = factory.get('/', HTTP_ACCEPT_ENCODING='gzip;q=0.5, br, zstd;q=0')
+        assert negotiate(request, 'application/json') == ('br' if 'br' in CODECS else 'gzip'), \
+            'Check that Accept-Encoding q-values decide the coding'
+        request = factory.get('/', HTTP_ACCEPT_ENCODING='identity')
+        assert negotiate(request, 'application/json') is None, \
+            'Check that nothing is compressed for clients that do not accept it'
+        assert negotiate(factory.get('/', HTTP_ACCEPT_ENCODING='*'), 'image/png') is None, \
+            'Check that only the content types of COMPRESSION_CONTENT_TYPES are compressed'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_14_compression(self, client, user_client, settings):
+        create_titles(user_client)
+        settings.COMPRESSION_MIN_SIZE = 100
+        settings.COMPRESSION_CONTENT_TYPES = {'application/json': ('gzip',)}
+        expected = client.get('/api/v1/titles/').content
+        response = client.get('/api/v1/titles/', HTTP_ACCEPT_ENCODING='gzip')
+        assert response['Content-Encoding'] == 'gzip' and 'Accept-Encoding' in response['Vary'], \
+            'Check that JSON responses are compressed with the negotiated coding'
+        assert gzip.decompress(response.content) == expected, \
+            'Check that compressed responses decompress to the regular body'
+        assert response['ETag'].startswith('W/'), \
+            'Check that compressed responses carry a weak ETag'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_15_compression_streaming(self, client, user_client, settings):
+        create_titles(user_client)
+        settings.COMPRESSION_MIN_SIZE = 100
+        settings.COMPRESSION_CONTENT_TYPES = {'application/json': ('gzip',)}
+        expected = client.get('/api/v1/titles/').content
+        settings.API_STREAMING_MIN_PAGE_SIZE = 1
+        response = client.get('/api/v1/titles/', HTTP_ACCEPT_ENCODING='gzip')
+        assert response.streaming and response['Content-Encoding'] == 'gzip', \
+            'Check that streamed pages are compressed as they are sent'
+        stream = iter(response.streaming_content)
+        first = next(stream)
+        decompressor = zlib.decompressobj(31)
+        assert decompressor.decompress(first).startswith(b'{"count"'), \
+            'Check that every part of a compressed stream is flushed as it is sent'
+        body = first + b''.join(stream)
+        assert gzip.decompress(body) == expected, \
+            'Check that compressed streams decompress to the regular body'
+
+    @pytest.mark.parametrize('coding', sorted(CODECS))
+    def test_16_compression_stream_flush(self, coding):
+        decompressors = {
+            'gzip': lambda: zlib.decompressobj(31).decompress,
+            'br': lambda: brotli.Decompressor().process,
+            'zstd': lambda: zstandard.ZstdDecompressor().decompressobj().decompress,
+        }
+        consumed = []
+
+        def parts():
+            for part in (b'{"count":1,"results":[', b'{"id":1}', b']}'):
+                consumed.append(part)
+                yield part
+
+        first = next(compress_stream(CODECS[coding], parts()))
+        assert consumed == [b'{"count":1,"results":['] and \
+            decompressors[coding]()(first) == b'{"count":1,"results":[', \
+            f'Check that {coding} streams yield the first part before reading the next one'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_17_compression_min_size(self, client, user_client, settings):
+        create_titles(user_client)
+        settings.COMPRESSION_MIN_SIZE = 10 ** 6
+        response = client.get('/api/v1/titles/', HTTP_ACCEPT_ENCODING='gzip')
+        assert not response.has_header('Content-Encoding'), \
+            'Check that responses under COMPRESSION_MIN_SIZE are not compressed'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_18_compression_cached_lists(self, client, user_client, settings, django_assert_num_queries):
+        create_titles(user_client)
+        settings.COMPRESSION_MIN_SIZE = 10
+        settings.COMPRESSION_CONTENT_TYPES = {'application/json': ('gzip',)}
+        expected = client.get('/api/v1/genres/').content
+        response = client.get('/api/v1/genres/', HTTP_ACCEPT_ENCODING='gzip')
+        assert response['X-Cache'] == 'MISS' and response['Content-Encoding'] == 'gzip', \
+            'Check that cached lists are compressed on a miss'
+        with django_assert_num_queries(0):
+            response = client.get('/api/v1/genres/', HTTP_ACCEPT_ENCODING='gzip')
+        assert response['X-Cache'] == 'HIT' and response['Content-Encoding'] == 'gzip', \
+            'Check that cached lists are served pre-compressed'
+        assert gzip.decompress(response.content) == expected, \
+            'Check that pre-compressed lists decompress to the regular body'
+        response = client.get('/api/v1/genres/')
+        assert not response.has_header('Content-Encoding') and response.content == expected, \
+            'Check that cached lists are kept per Content-Encoding'
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize('path', ['/api/v1/titles/', '/api/v1/genres/', '/api/v1/categories/'])
+    def test_19_edge_cache_headers(self, client, user_client, settings, path):
+        create_titles(user_client)
+        response = client.get(path)
+        assert 'public' in response['Cache-Control'] \
+            and f's-maxage={settings.EDGE_CACHE_TIMEOUT}' in response['Cache-Control'], \
+            f'Check that anonymous GET requests `{path}` may be kept by shared caches'
+        assert 'Authorization' in response['Vary'], \
+            f'Check that GET requests `{path}` vary on the Authorization header'
+        response = user_client.get(path)
+        assert 'private' in response['Cache-Control'], \
+            f'Check that authorized GET requests `{path}` are not kept by shared caches'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_20_edge_cache_purge_disabled(self, user_client, monkeypatch):
+        purged = purge_requests(monkeypatch)
+        user_client.post('/api/v1/genres/', data={'name': 'Action', 'slug': 'action'})
+        assert purged == [], \
+            'Check that nothing is purged while EDGE_CACHE_PURGE_URL is not set'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_21_edge_cache_purge_genres(self, user_client, settings, monkeypatch):
+        user_client.post('/api/v1/genres/', data={'name': 'Action', 'slug': 'action'})
+        purged = purge_requests(monkeypatch)
+        settings.EDGE_CACHE_PURGE_URL = 'http://nginx/'
+        user_client.delete('/api/v1/genres/action/')
+        assert purged == [('PURGE', 'http://nginx/api/v1/genres/*'),
+                          ('PURGE', 'http://nginx/api/v1/titles/*')], \
+            'Check that genre writes purge the cached genres and titles'
+        purged.clear()
+        user_client.delete('/api/v1/genres/action/')
+        assert purged == [], \
+            'Check that failed writes purge nothing'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_22_edge_cache_purge_titles(self, client, user_client, settings, monkeypatch):
+        titles, categories, genres = create_titles(user_client)
+        purged = purge_requests(monkeypatch)
+        settings.EDGE_CACHE_PURGE_URL = 'http://nginx/'
+        user_client.patch(f'/api/v1/titles/{titles[0]["id"]}/', data={'name': 'Renamed'})
+        assert purged == [('PURGE', 'http://nginx/api/v1/titles/*')], \
+            'Check that title writes purge the cached titles'
+
+    def test_23_process_local_cache(self):
+        config = runpy.run_path('gunicorn.conf.py')
+        errors = []
+        assert [warning.id for warning in check_shared_cache(None)] == ['api.W001'], \
+            'Check that the deploy checks warn about a process-local cache'
+        with pytest.raises(SystemExit):
+            config['on_starting'](gunicorn_server(errors))
+        assert errors, \
+            'Check that gunicorn refuses to start several workers with a process-local cache'
+
+    def test_24_shared_cache(self, settings, tmp_path, monkeypatch):
+        config = runpy.run_path('gunicorn.conf.py')
+        errors = []
+        settings.CACHES = {'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': str(tmp_path / 'cache'),
+        }}
+        metrics = tmp_path / 'metrics'
+        metrics.mkdir()
+        (metrics / 'counter_1.db').write_bytes(b'stale')
+        monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(metrics))
+        assert check_shared_cache(None) == [], \
+            'Check that the deploy checks accept a shared cache'
+        config['on_starting'](gunicorn_server(errors))
+        assert errors == [], \
+            'Check that gunicorn starts several workers with a shared cache'
+        assert metrics.is_dir() and not any(metrics.iterdir()), \
+            'Check that gunicorn clears the metric samples of a previous run on start'
@@ -0,0 +1,240 @@
+import csv
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from api.bulk import keep_auto_now_add, refresh_derived_data, reset_sequences
+from api.models import Category, Comment, Genre, Review, Title, User
+
+from .common import create_titles
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as target:
+        writer = csv.DictWriter(target, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+
+def write_jsonl(path, rows):
+    with open(path, 'w', encoding='utf-8') as target:
+        for row in rows:
+            target.write(json.dumps(row) + '\n')
+    return str(path)
+
+
+def import_data(model, path, *args):
+    call_command('import_data', model, path, *args, stdout=StringIO())
+
+
+def next_id(model):
+    last = model.objects.order_by('-pk').values_list('pk', flat=True).first()
+    return (last or 0) + 1
+
+
+def search(client, word):
+    return [title['name'] for title in client.get(f'/api/v1/titles/?search={word}').json()['results']]
+
+
+def import_failing_titles(tmp_path, title_id):
+    path = write_csv(tmp_path / 'title.csv', [
+        {'id': title_id, 'name': 'Imported', 'year': 2000, 'category': 'films', 'genre': ''},
+        {'id': title_id + 1, 'name': 'Orphan', 'year': 2000, 'category': 'missing', 'genre': ''},
+    ])
+    with pytest.raises(CommandError, match='row 2: Unknown Category slug: missing'):
+        import_data('title', path, '--batch-size', '1')
+
+
+@pytest.fixture
+def imported(client, tmp_path):
+    """Import two rows of every model from files, return the first id of each."""
+    # caches the title list
+    client.get('/api/v1/titles/')
+    # Ids past the rows earlier tests left in the sequences.
+    user_id, title_id, review_id, comment_id = (
+        next_id(model) + 100 for model in (User, Title, Review, Comment)
+    )
+    import_data('category', write_csv(tmp_path / 'category.csv', [
+        {'id': next_id(Category), 'name': 'Movie', 'slug': 'movie'},
+        {'id': next_id(Category) + 1, 'name': 'Book', 'slug': 'book'},
+    ]))
+    import_data('genre', write_jsonl(tmp_path / 'genre.jsonl', [
+        {'name': 'Drama', 'slug': 'drama'},
+        {'name': 'Comedy', 'slug': 'comedy'},
+    ]))
+    import_data('user', write_csv(tmp_path / 'user.csv', [
+        {'id': user_id, 'username': 'reader', 'email': 'reader@yamdb.fake', 'role': 'user'},
+        {'id': user_id + 1, 'username': 'critic', 'email': 'critic@yamdb.fake', 'role': 'moderator'},
+    ]))
+    import_data('title', write_jsonl(tmp_path / 'title.jsonl', [
+        {'id': title_id, 'name': 'Solaris', 'year': 1972, 'category': 'movie', 'genre': 'drama'},
+        {'id': title_id + 1, 'name': 'Roadside Picnic', 'year': 1972, 'category': 'book',
+         'genre': 'drama,comedy'},
+    ]))
+    import_data('review', write_csv(tmp_path / 'review.csv', [
+        {'id': review_id, 'title': title_id, 'author': 'reader', 'text': 'Slow', 'score': 6,
+         'pub_date': '2019-01-01T10:00:00Z'},
+        {'id': review_id + 1, 'title': title_id, 'author': 'critic', 'text': 'Deep', 'score': 8,
+         'pub_date': ''},
+    ]))
+    import_data('comment', write_jsonl(tmp_path / 'comment.jsonl', [
+        {'id': comment_id, 'review': review_id, 'author': 'critic', 'text': 'Agreed'},
+        {'id': comment_id + 1, 'review': review_id, 'author': 'reader', 'text': 'Thanks'},
+    ]), '--batch-size', '1')
+    return {'user': user_id, 'title': title_id, 'review': review_id, 'comment': comment_id}
+
+
+class Test10Import:
+
+    def test_01_keep_auto_now_add(self):
+        field = Review._meta.get_field('pub_date')
+        with keep_auto_now_add(Review):
+            assert not field.auto_now_add, \
+                'Check that `keep_auto_now_add` lets bulk_create store the given `pub_date`'
+        assert field.auto_now_add, \
+            'Check that `keep_auto_now_add` restores `auto_now_add`'
+        with pytest.raises(RuntimeError):
+            with keep_auto_now_add(Review):
+                raise RuntimeError('batch failed')
+        assert field.auto_now_add, \
+            'Check that `keep_auto_now_add` restores `auto_now_add` when the import fails'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_reset_sequences(self, user_client):
+        category = Category.objects.create(name='First', slug='first')
+        Category.objects.bulk_create([Category(id=category.pk + 100, name='Imported', slug='imported')])
+        reset_sequences('default', Category)
+        response = user_client.post('/api/v1/categories/', data={'name': 'Next', 'slug': 'next'})
+        assert response.status_code == 201 and Category.objects.get(slug='next').pk > category.pk + 100, \
+            'Check that `reset_sequences` moves ids past rows inserted with explicit ids'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_refresh_derived_data(self, client, user_client, admin):
+        titles, _, _ = create_titles(user_client)
+        # caches the title list
+        client.get('/api/v1/titles/')
+        title = Title.objects.get(pk=titles[0]['id'])
+        Title.objects.bulk_create([Title(id=title.pk + 10, name='Bulkington', year=2001,
+                                         category_id=title.category_id)])
+        Review.objects.bulk_create([Review(title=title, author=admin, text='Bulk', score=6)])
+        review = Review.objects.get(title=title)
+        Comment.objects.bulk_create([Comment(review=review, author=admin, text='Bulk')] * 3)
+        refresh_derived_data([Title, Review, Comment], stdout=StringIO())
+        title.refresh_from_db()
+        review.refresh_from_db()
+        assert (title.rating_sum, title.rating_count, review.comments_count) == (6, 1, 3), \
+            'Check that `refresh_derived_data` rebuilds ratings and comment counts'
+        assert search(client, 'Bulkington') == ['Bulkington'], \
+            'Check that `refresh_derived_data` rebuilds the title search index'
+        assert client.get('/api/v1/titles/').json()['count'] == 3, \
+            'Check that `refresh_derived_data` invalidates cached title lists'
+
+    def test_04_refresh_derived_data_database(self, replica, admin):
+        category = Category.objects.using(replica).create(name='Movie', slug='films')
+        title = Title.objects.using(replica).create(name='Elsewhere', year=2001, category=category)
+        User.objects.using(replica).bulk_create([admin])
+        Review.objects.using(replica).bulk_create([Review(title=title, author=admin, text='Bulk', score=6)])
+        review = Review.objects.using(replica).get(title=title)
+        Comment.objects.using(replica).bulk_create([Comment(review=review, author=admin, text='Bulk')] * 2)
+
+        refresh_derived_data([Title, Review, Comment], using=replica, stdout=StringIO())
+        title.refresh_from_db()
+        review.refresh_from_db()
+        assert (title.rating_sum, title.rating_count, review.comments_count) == (6, 1, 2), \
+            'Check that `refresh_derived_data` rebuilds ratings and comment counts of the given database'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_import_files(self, imported):
+        user_id = imported['user']
+        assert (Category.objects.count(), Genre.objects.count(), User.objects.filter(pk__gte=user_id).count()) \
+            == (2, 2, 2), \
+            'Check that `import_data` imports CSV and JSONL rows of every model'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_06_import_title_genres(self, imported):
+        assert sorted(Title.objects.get(pk=imported['title'] + 1).genre.values_list('slug', flat=True)) \
+            == ['comedy', 'drama'], \
+            'Check that `import_data` links titles to their genres by slug'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_07_import_pub_date(self, imported):
+        assert str(Review.objects.get(pk=imported['review']).pub_date.date()) == '2019-01-01', \
+            'Check that `import_data` keeps the given `pub_date`'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_08_import_counters(self, client, imported):
+        title = client.get(f'/api/v1/titles/{imported["title"]}/').json()
+        assert (title['rating'], title['reviews_count']) == (7, 2), \
+            'Check that `import_data` updates the rating counters of titles'
+        assert Review.objects.get(pk=imported['review']).comments_count == 2, \
+            'Check that `import_data` updates the comment counters of reviews'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_09_import_search_and_lists(self, client, imported):
+        assert search(client, 'Picnic') == ['Roadside Picnic'], \
+            'Check that imported titles are found by search'
+        assert client.get('/api/v1/titles/').json()['count'] == 2, \
+            'Check that `import_data` invalidates cached title lists'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_10_import_sequences(self, user_client, imported):
+        title_id, review_id = imported['title'], imported['review']
+        response = user_client.post('/api/v1/titles/', data={'name': 'Stalker', 'year': 1979, 'genre': ['drama'],
+                                                             'category': 'movie'})
+        assert response.status_code == 201 and response.json()['id'] > title_id + 1, \
+            'Check that ids continue after the imported ones'
+        response = user_client.post(f'/api/v1/titles/{title_id}/reviews/', data={'text': 'Mine', 'score': 3})
+        assert response.status_code == 201 and response.json()['id'] > review_id + 1, \
+            'Check that review ids continue after the imported ones'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_11_import_failing_batch(self, client, user_client, tmp_path):
+        titles, _, _ = create_titles(user_client)
+        # caches the title list
+        client.get('/api/v1/titles/')
+        title_id = max(title['id'] for title in titles) + 100
+        import_failing_titles(tmp_path, title_id)
+        assert list(Title.objects.filter(pk__gte=title_id).values_list('name', flat=True)) == ['Imported'], \
+            'Check that a failing batch is rolled back and the batches before it are kept'
+        assert search(client, 'Imported') == ['Imported'] and client.get('/api/v1/titles/').json()['count'] == 3, \
+            'Check that titles of the batches before a failure are indexed and listed'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_12_import_failing_batch_sequences(self, user_client, tmp_path):
+        titles, _, _ = create_titles(user_client)
+        title_id = max(title['id'] for title in titles) + 100
+        import_failing_titles(tmp_path, title_id)
+        response = user_client.post('/api/v1/titles/', data={'name': 'Next', 'year': 2001, 'genre': [],
+                                                             'category': 'films'})
+        assert response.status_code == 201 and response.json()['id'] > title_id, \
+            'Check that sequences are reset after a failing import as well'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_13_import_conflicts(self, client, user_client, tmp_path):
+        titles, _, _ = create_titles(user_client)
+        title_id = titles[0]['id']
+        path = write_jsonl(tmp_path / 'review.jsonl', [
+            {'title': title_id, 'author': 'TestUser', 'text': 'Good', 'score': 8},
+            {'title': title_id, 'author': 'TestUser', 'text': 'Twice', 'score': 2},
+        ])
+        with pytest.raises(CommandError, match='--ignore-conflicts'):
+            import_data('review', path, '--batch-size', '1')
+        title = client.get(f'/api/v1/titles/{title_id}/').json()
+        assert (title['rating'], title['reviews_count']) == (8, 1), \
+            'Check that rating counters cover the batches stored before a failure'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_14_import_ignore_conflicts(self, user_client, tmp_path):
+        titles, _, _ = create_titles(user_client)
+        title_id = titles[0]['id']
+        path = write_jsonl(tmp_path / 'review.jsonl', [
+            {'title': title_id, 'author': 'TestUser', 'text': 'Good', 'score': 8},
+            {'title': title_id, 'author': 'TestUser', 'text': 'Twice', 'score': 2},
+        ])
+        import_data('review', path, '--ignore-conflicts')
+        assert list(Review.objects.filter(title_id=title_id).values_list('text', flat=True)) == ['Good'], \
+            'Check that `--ignore-conflicts` skips rows that already exist'
@@ -0,0 +1,78 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+
+from api.management.commands.generate_data import CATEGORIES, GENRES
+from api.models import Category, Comment, Genre, Review, Title, User
+
+
+@pytest.fixture
+def generated():
+    call_command('generate_data', '--reviews', '200', '--titles', '5', '--users', '40',
+                 '--seed', '3', '--batch-size', '30', stdout=StringIO())
+
+
+class Test11GenerateData:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_generate_data(self, admin, generated):
+        assert (Category.objects.count(), Genre.objects.count()) == (len(CATEGORIES), len(GENRES)), \
+            'Check that `generate_data` creates every category and genre'
+        assert (User.objects.exclude(pk=admin.pk).count(), Title.objects.count()) == (40, 5), \
+            'Check that `generate_data` creates the requested number of users and titles'
+        assert Review.objects.exists() and Comment.objects.exists(), \
+            'Check that `generate_data` creates reviews and comments'
+        assert not Title.objects.annotate(genres=Count('genre')).filter(genres=0).exists(), \
+            'Check that every generated title has a genre'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_generated_counters(self, generated):
+        for title in Title.objects.annotate(reviews_total=Count('reviews'), scores=Sum('reviews__score')):
+            assert (title.rating_count, title.rating_sum) == (title.reviews_total, title.scores or 0), \
+                'Check that `rating_count` and `rating_sum` of generated titles match their reviews'
+        mismatched = Review.objects.annotate(total=Count('comments')).exclude(comments_count=F('total'))
+        assert not mismatched.exists(), \
+            'Check that `comments_count` of generated reviews matches their comments'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_generated_comment_dates(self, generated):
+        review_dates = Review.objects.filter(pk=OuterRef('review')).values('pub_date')
+        assert not Comment.objects.filter(pub_date__lt=Subquery(review_dates)).exists(), \
+            'Check that generated comments are written after their review'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_create_after_generate_data(self, user_client, generated):
+        titles = Title.objects.count()
+        category, genre = Category.objects.first(), Genre.objects.first()
+        response = user_client.post('/api/v1/titles/', data={'name': 'After', 'year': 2000, 'genre': [genre.slug],
+                                                             'category': category.slug})
+        assert response.status_code == 201 and Title.objects.count() == titles + 1, \
+            'Check that titles can be created through the API after `generate_data`'
+        title_id = response.json()['id']
+        response = user_client.post(f'/api/v1/titles/{title_id}/reviews/', data={'text': 'Fine', 'score': 7})
+        assert response.status_code == 201, \
+            'Check that reviews can be created through the API after `generate_data`'
+        review_id = response.json()['id']
+        response = user_client.post(f'/api/v1/titles/{title_id}/reviews/{review_id}/comments/',
+                                    data={'text': 'Agreed'})
+        assert response.status_code == 201, \
+            'Check that comments can be created through the API after `generate_data`'
+        response = user_client.post('/api/v1/users/', data={'username': 'after', 'email': 'after@yamdb.fake'})
+        assert response.status_code == 201, \
+            'Check that users can be created through the API after `generate_data`'
+        response = user_client.post('/api/v1/categories/', data={'name': 'After', 'slug': 'after'})
+        assert response.status_code == 201, \
+            'Check that categories can be created through the API after `generate_data`'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_rating_after_generate_data(self, client, user_client, generated):
+        category, genre = Category.objects.first(), Genre.objects.first()
+        response = user_client.post('/api/v1/titles/', data={'name': 'After', 'year': 2000, 'genre': [genre.slug],
+                                                             'category': category.slug})
+        title_id = response.json()['id']
+        user_client.post(f'/api/v1/titles/{title_id}/reviews/', data={'text': 'Fine', 'score': 7})
+        title = client.get(f'/api/v1/titles/{title_id}/').json()
+        assert (title['rating'], title['reviews_count']) == (7, 1), \
+            'Check that new reviews keep the rating of titles consistent after `generate_data`'